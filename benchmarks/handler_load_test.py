@@ -0,0 +1,313 @@
+"""
+In-process load test for the bot's handlers.
+
+The real handler functions of telegram_bot.py (start, categories,
+all_products, handle_category_selection) are driven with synthetic Update
+objects, as when hundreds of users tap the menu right after the 00:00
+broadcast. Outgoing Bot API calls go to a recording Bot that answers
+locally after a configurable delay. The database is either the one
+configured in .env (--db postgres) or a seeded in-memory stand-in that
+answers the handlers' queries after a configurable delay (--db memory).
+
+Reported: handler latency percentiles, database queries per update, Bot
+API calls per update and the time the event loop was blocked.
+
+Usage:
+    python -m benchmarks.handler_load_test --updates 1000 --concurrency 200
+    python -m benchmarks.handler_load_test --db postgres --updates 500
+"""
+
+import argparse
+import asyncio
+import contextvars
+import itertools
+import random
+import re
+import time
+from types import SimpleNamespace
+from telegram import Bot, Update
+import database.database_handler as database_handler
+import database.delivery_handler as delivery_handler
+import database.media_cache_handler as media_cache_handler
+import database.product_repository as product_repository
+import database.watchlist_handler as watchlist_handler
+import telegram_bot
+from benchmarks.webhook_load_test import percentile
+from config.constants import ProductTable, MediaCacheTable
+from database.query_cache import invalidate_query_cache
+
+STUB_TOKEN = "123456:LOADTEST"
+CATEGORIES = ["美妝", "家電", "食品", "服飾", "其他"]
+DEFAULT_MIX = "start=1,categories=2,all=3,category=4"
+LAG_INTERVAL = 0.005    # 事件迴圈延遲的取樣間隔 (秒)
+LAG_THRESHOLD = 0.010   # 超過此延遲才算阻塞
+
+# 透過 execute_query 存取資料庫的模組
+QUERY_MODULES = (database_handler, product_repository, media_cache_handler, watchlist_handler, delivery_handler)
+
+# 目前處理中的 update 的查詢計數；asyncio.to_thread 會複製 context，所以在執行緒中也能累加
+current_queries = contextvars.ContextVar("current_queries", default=None)
+
+
+class RecordingBot(Bot):
+    """
+    Bot whose API calls are answered locally and recorded instead of sent.
+    """
+
+    def __init__(self, api_latency):
+        super().__init__(token=STUB_TOKEN)
+        # Bot 物件在建立後會被凍結
+        with self._unfrozen():
+            self.api_latency = api_latency
+            self.calls = {}
+            self.message_ids = itertools.count(1)
+
+    async def _do_post(self, endpoint, data, **kwargs):
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+        if endpoint == "sendMediaGroup":
+            return [self.fake_message(data, photo=True) for _ in data.get("media", [])]
+        if endpoint in ("sendMessage", "sendPhoto"):
+            return self.fake_message(data, photo=endpoint == "sendPhoto")
+        return True
+
+    def fake_message(self, data, photo=False):
+        """
+        A minimal Message payload for the chat of a request.
+        """
+        message_id = next(self.message_ids)
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(data.get("chat_id", 0)), "type": "private"},
+        }
+        if photo:
+            file_id = f"stub-file-{message_id}"
+            message["photo"] = [{
+                "file_id": file_id,
+                "file_unique_id": file_id,
+                "width": 800,
+                "height": 800,
+                "file_size": 60000,
+            }]
+        return message
+
+
+class MemoryDatabase:
+    """
+    Seeded stand-in for the handlers' queries, with a simulated round trip.
+
+    It recognises the queries by the table they read; writes (media cache)
+    are acknowledged and dropped.
+    """
+
+    def __init__(self, products, query_latency):
+        self.query_latency = query_latency
+        self.products = products
+
+    def execute_query(self, query, params=None, fetch=False, fetch_all=False):
+        if self.query_latency:
+            time.sleep(self.query_latency)
+
+        if not (fetch or fetch_all):
+            return None
+        if f'FROM "{MediaCacheTable.TABLE_NAME.value}"' in query:
+            return []
+        if f'SELECT DISTINCT "{ProductTable.CATEGORY.value}"' in query:
+            return [(category,) for category in CATEGORIES]
+        if f'FROM "{ProductTable.TABLE_NAME.value}"' in query:
+            return self.select_products(query, params)
+        return [] if fetch_all else None
+
+    def select_products(self, query, params):
+        """
+        Rows of the seeded products, shaped like the repository's select list.
+        """
+        select_list = re.sub(r"DISTINCT ON \([^)]*\)", "", query.split("FROM", 1)[0])
+        columns = re.findall(rf'"{ProductTable.TABLE_NAME.value}"\."(\w+)"', select_list)
+        columns += re.findall(r"AS (\w+)", select_list)
+
+        products = self.products
+        if params and f'"{ProductTable.CATEGORY.value}" = %s' in query:
+            products = [product for product in products if product[ProductTable.CATEGORY.value] == params[0]]
+
+        return [tuple(product.get(column) for column in columns) for product in products]
+
+
+def seed_products(count):
+    """
+    Synthetic products of today, spread over the categories.
+    """
+    products = []
+    for index in range(count):
+        products.append({
+            ProductTable.ID.value: 10_000_000 + index,
+            ProductTable.PRODUCT_NAME.value: f"限時搶購 商品名稱 {index}",
+            ProductTable.BRAND.value: f"品牌 {index % 50}",
+            ProductTable.IMAGE_URL.value: f"https://img.momoshop.com.tw/goodsimg/{index}.jpg",
+            ProductTable.PRICE.value: 100 + index % 5000,
+            ProductTable.CATEGORY.value: CATEGORIES[index % len(CATEGORIES)],
+            "is_lowest_price": index % 7 == 0,
+        })
+    return products
+
+
+def instrument_queries(execute_query):
+    """
+    Route every module's execute_query through a counting wrapper.
+    """
+    def counted(*args, **kwargs):
+        counter = current_queries.get()
+        if counter is not None:
+            counter[0] += 1
+        return execute_query(*args, **kwargs)
+
+    for module in QUERY_MODULES:
+        module.execute_query = counted
+
+
+def parse_mix(mix):
+    """
+    Parse "start=1,categories=2" into a list of (kind, weight).
+    """
+    weights = []
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        weights.append((kind.strip(), float(weight or 1)))
+    return weights
+
+
+def build_update(kind, index, bot):
+    """
+    A synthetic Update for one user tapping a menu entry, and its handler.
+    """
+    if kind == "category":
+        text = CATEGORIES[index % len(CATEGORIES)]
+        handler = telegram_bot.handle_category_selection
+    else:
+        text = f"/{kind}"
+        handler = {
+            "start": telegram_bot.start,
+            "about": telegram_bot.about_bot,
+            "categories": telegram_bot.categories,
+            "all": telegram_bot.all_products,
+        }[kind]
+
+    chat_id = 1_000_000 + index
+    message = {
+        "message_id": index + 1,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private", "first_name": "LoadTest"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "LoadTest"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+
+    update = Update.de_json({"update_id": 300_000_000 + index, "message": message}, bot)
+    return kind, handler, update
+
+
+async def monitor_event_loop(stop, samples):
+    """
+    Measure how late the loop wakes up from short sleeps until `stop` is set.
+    """
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(loop.time() - start - LAG_INTERVAL)
+
+
+async def run_load(updates, bot, concurrency):
+    """
+    Run every update through its handler with bounded concurrency.
+    Returns per-update (kind, latency, queries) and the event-loop lag samples.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    lag_samples = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_event_loop(stop, lag_samples))
+
+    async def handle(kind, handler, update):
+        async with semaphore:
+            counter = [0]
+            current_queries.set(counter)
+            context = SimpleNamespace(bot=bot, args=[])
+            start = time.perf_counter()
+            await handler(update, context)
+            results.append((kind, time.perf_counter() - start, counter[0]))
+
+    # 每個 update 是獨立的 task，各自有自己的 context
+    await asyncio.gather(*(asyncio.create_task(handle(*entry)) for entry in updates))
+    stop.set()
+    await monitor
+
+    return results, lag_samples
+
+
+def report(name, latencies, queries):
+    """
+    Print latency percentiles in milliseconds and the mean queries per update.
+    """
+    print(
+        f"{name:<10} n={len(latencies):<5} "
+        f"p50={percentile(latencies, 50) * 1000:7.1f} ms  "
+        f"p95={percentile(latencies, 95) * 1000:7.1f} ms  "
+        f"p99={percentile(latencies, 99) * 1000:7.1f} ms  "
+        f"queries/update={sum(queries) / max(len(queries), 1):5.2f}"
+    )
+
+
+def main():
+    """
+    Run the load test.
+    """
+    parser = argparse.ArgumentParser(description="Load test the bot's handlers in-process.")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weights per update kind (start, about, categories, all, category)")
+    parser.add_argument("--db", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--products", type=int, default=300, help="Seeded products for --db memory")
+    parser.add_argument("--query-latency", type=float, default=5, help="Simulated query time in ms for --db memory")
+    parser.add_argument("--api-latency", type=float, default=30, help="Simulated Bot API round trip in ms")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.db == "memory":
+        database = MemoryDatabase(seed_products(args.products), args.query_latency / 1000)
+        instrument_queries(database.execute_query)
+    else:
+        instrument_queries(database_handler.execute_query)
+    invalidate_query_cache()
+
+    bot = RecordingBot(args.api_latency / 1000)
+    rng = random.Random(args.seed)
+    kinds, weights = zip(*parse_mix(args.mix))
+    updates = [build_update(kind, index, bot) for index, kind in enumerate(rng.choices(kinds, weights, k=args.updates))]
+
+    start = time.perf_counter()
+    results, lag_samples = asyncio.run(run_load(updates, bot, args.concurrency))
+    elapsed = time.perf_counter() - start
+
+    print(f"updates={len(results)} concurrency={args.concurrency} db={args.db} elapsed={elapsed:.2f} s")
+    for kind in sorted(set(kinds)):
+        rows = [row for row in results if row[0] == kind]
+        if rows:
+            report(kind, [row[1] for row in rows], [row[2] for row in rows])
+    report("total", [row[1] for row in results], [row[2] for row in results])
+
+    blocked = [lag for lag in lag_samples if lag > LAG_THRESHOLD]
+    print(
+        f"event loop: blocked {sum(blocked) * 1000:.1f} ms in {len(blocked)} stalls, "
+        f"max lag {max(lag_samples, default=0) * 1000:.1f} ms"
+    )
+    print("bot api calls: " + ", ".join(f"{endpoint}={count}" for endpoint, count in sorted(bot.calls.items())))
+    print(f"bot api calls/update={sum(bot.calls.values()) / max(len(results), 1):.2f}")
+
+
+if __name__ == "__main__":
+    main()
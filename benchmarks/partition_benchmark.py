@@ -0,0 +1,148 @@
+"""
+Query timings of the "today" queries on the products table as it was before
+partitioning versus the monthly partitioned layout, on a synthetic
+multi-year dataset.
+
+"before" is the table, indexes and predicates the repository used before
+the partitioning migration: the original columns with the UNIQUE
+product_info_block constraint, the (i_code, purchase_start_time) index of
+migration 002 and DATE(purchase_end_time) = CURRENT_DATE. "after" is the
+partitioned table with the indexes of migration 003 and the range predicate
+used by the repository. Both tables are temporary; the real products table
+is not touched.
+
+Usage:
+    python -m benchmarks.partition_benchmark --years 3 --rows-per-day 2000
+"""
+
+import argparse
+import time
+from database.db_connection import get_connection, release_connection
+
+# 兩種版面使用分割前相同的欄位，只比較資料表版面與條件
+TODAY_COLUMNS = "id, product_name, brand, image_url, price, countdown, purchase_start_time, purchase_end_time"
+CATEGORY_COLUMNS = "id, product_name, brand, price"
+TODAY_RANGE = "purchase_end_time >= CURRENT_DATE AND purchase_end_time < CURRENT_DATE + 1"
+
+BEFORE_TODAY = f"SELECT DISTINCT ON (id) {TODAY_COLUMNS} FROM {{table}} WHERE DATE(purchase_end_time) = CURRENT_DATE"
+AFTER_TODAY = f"SELECT DISTINCT ON (id) {TODAY_COLUMNS} FROM {{table}} WHERE {TODAY_RANGE}"
+BEFORE_CATEGORY = f"SELECT {CATEGORY_COLUMNS} FROM {{table}} WHERE category = '美妝' AND DATE(purchase_end_time) = CURRENT_DATE"
+AFTER_CATEGORY = f"SELECT {CATEGORY_COLUMNS} FROM {{table}} WHERE category = '美妝' AND {TODAY_RANGE}"
+
+# 分割前的 products 欄位
+COLUMNS = """
+    id INTEGER,
+    product_info_block TEXT,
+    product_name TEXT,
+    brand TEXT,
+    image_url TEXT,
+    price INTEGER,
+    purchase_start_time TIMESTAMPTZ,
+    purchase_end_time TIMESTAMPTZ,
+    last_updated TIMESTAMPTZ,
+    countdown INTEGER,
+    original_count INTEGER,
+    category VARCHAR(10)
+"""
+
+
+def create_tables(cursor, years, rows_per_day):
+    """
+    Create the pre-partitioning and the partitioned temporary tables, with
+    their indexes, holding the same rows.
+    """
+    cursor.execute(f"CREATE TEMP TABLE bench_flat ({COLUMNS}, UNIQUE (product_info_block));")
+    cursor.execute("CREATE UNIQUE INDEX ON bench_flat (id, purchase_start_time);")
+    cursor.execute(f"CREATE TEMP TABLE bench_partitioned ({COLUMNS}) PARTITION BY RANGE (purchase_end_time);")
+    cursor.execute("""
+        DO $$
+        DECLARE month_start DATE := date_trunc('month', NOW() - make_interval(years => %s))::DATE;
+        BEGIN
+            WHILE month_start <= date_trunc('month', NOW() + INTERVAL '1 month')::DATE LOOP
+                EXECUTE format(
+                    'CREATE TEMP TABLE %%I PARTITION OF bench_partitioned FOR VALUES FROM (%%L) TO (%%L)',
+                    'bench_p' || to_char(month_start, 'YYYY_MM'),
+                    month_start,
+                    (month_start + INTERVAL '1 month')::DATE
+                );
+                month_start := (month_start + INTERVAL '1 month')::DATE;
+            END LOOP;
+        END $$;
+    """ % int(years))
+    cursor.execute("""
+        INSERT INTO bench_flat
+        SELECT
+            10000000 + n,
+            (end_time - INTERVAL '2 hours') || '|' || end_time || '|品牌 ' || (n %% 500) || '|商品名稱 ' || n,
+            '商品名稱 ' || n,
+            '品牌 ' || (n %% 500),
+            'https://img.momoshop.com.tw/goodsimg/' || n || '.jpg',
+            100 + n %% 5000,
+            end_time - INTERVAL '2 hours',
+            end_time,
+            end_time - INTERVAL '1 hour',
+            n %% 100,
+            100,
+            (ARRAY['美妝', '家電', '食品', '服飾', '其他'])[1 + n %% 5]
+        FROM (
+            SELECT n, date_trunc('day', NOW()) - make_interval(days => n / %s) + make_interval(mins => n %% 1440) AS end_time
+            FROM generate_series(0, %s - 1) AS n
+        ) AS generated;
+    """, (rows_per_day, rows_per_day * 365 * years))
+    cursor.execute("INSERT INTO bench_partitioned SELECT * FROM bench_flat;")
+    cursor.execute("CREATE UNIQUE INDEX ON bench_partitioned (id, purchase_start_time, purchase_end_time);")
+    cursor.execute("CREATE INDEX ON bench_partitioned (purchase_end_time);")
+    cursor.execute("CREATE INDEX ON bench_partitioned (category, purchase_end_time);")
+    cursor.execute("ANALYZE bench_flat; ANALYZE bench_partitioned;")
+
+
+def time_query(cursor, query, repeat):
+    """
+    Best-of-N execution time of a query, in milliseconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(query)
+        cursor.fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the partitioned products table against the pre-partitioning one.")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--rows-per-day", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    conn = get_connection()
+    if conn is None:
+        print("Database connection failed.")
+        return
+
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                create_tables(cursor, args.years, args.rows_per_day)
+                results = [
+                    ("today", time_query(cursor, BEFORE_TODAY.format(table="bench_flat"), args.repeat),
+                     time_query(cursor, AFTER_TODAY.format(table="bench_partitioned"), args.repeat)),
+                    ("category", time_query(cursor, BEFORE_CATEGORY.format(table="bench_flat"), args.repeat),
+                     time_query(cursor, AFTER_CATEGORY.format(table="bench_partitioned"), args.repeat)),
+                ]
+            conn.rollback()
+    finally:
+        release_connection(conn)
+
+    print(f"rows={args.rows_per_day * 365 * args.years} years={args.years}")
+    for name, before, after in results:
+        print(f"{name:<9} before={before:9.1f} ms  after={after:9.1f} ms  speedup={before / after:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
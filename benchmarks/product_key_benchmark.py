@@ -0,0 +1,113 @@
+"""
+Index size and lookup speed of the product deduplication keys.
+
+Compares the old UNIQUE index on the product_info_block text with the
+composite (i_code, purchase_start_time) index, on a temporary table filled
+with synthetic rows. Requires the database settings from .env; nothing is
+written to the real products table.
+
+Usage:
+    python -m benchmarks.product_key_benchmark --rows 500000 --lookups 20000
+"""
+
+import argparse
+import random
+import time
+from database.db_connection import get_connection, release_connection
+
+
+def populate(cursor, rows):
+    """
+    Fill a temporary table with synthetic products.
+    """
+    cursor.execute("""
+        CREATE TEMP TABLE key_bench (
+            id INTEGER,
+            product_info_block TEXT,
+            purchase_start_time TIMESTAMPTZ
+        ) ON COMMIT DROP;
+    """)
+    cursor.execute("""
+        INSERT INTO key_bench
+        SELECT
+            10000000 + (n %% 200000),
+            (TIMESTAMP '2023-01-01' + (n / 200000) * INTERVAL '1 hour')::text || '|' ||
+            (TIMESTAMP '2023-01-01' + (n / 200000) * INTERVAL '1 hour' + INTERVAL '2 hours')::text || '|' ||
+            '品牌名稱 ' || (n %% 3000) || '|' ||
+            '限時搶購 超值組合 商品名稱範例 ' || n || ' 入組 加贈好禮',
+            TIMESTAMP '2023-01-01' + (n / 200000) * INTERVAL '1 hour'
+        FROM generate_series(0, %s - 1) AS n;
+    """, (rows,))
+
+
+def index_size(cursor, name):
+    """
+    Size of an index in bytes.
+    """
+    cursor.execute("SELECT pg_relation_size(%s::regclass);", (name,))
+    return cursor.fetchone()[0]
+
+
+def time_lookups(cursor, query, params_list):
+    """
+    Run a lookup query for each parameter tuple and return the elapsed seconds.
+    """
+    start = time.perf_counter()
+    for params in params_list:
+        cursor.execute(query, params)
+        cursor.fetchone()
+    return time.perf_counter() - start
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark product deduplication keys.")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    conn = get_connection()
+    if conn is None:
+        print("Database connection failed.")
+        return
+
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                populate(cursor, args.rows)
+                cursor.execute("CREATE UNIQUE INDEX key_bench_block ON key_bench (product_info_block);")
+                cursor.execute("CREATE UNIQUE INDEX key_bench_composite ON key_bench (id, purchase_start_time);")
+                cursor.execute("ANALYZE key_bench;")
+
+                cursor.execute(
+                    "SELECT id, product_info_block, purchase_start_time FROM key_bench ORDER BY random() LIMIT %s;",
+                    (args.lookups,),
+                )
+                samples = cursor.fetchall()
+                random.shuffle(samples)
+
+                block_time = time_lookups(
+                    cursor,
+                    "SELECT 1 FROM key_bench WHERE product_info_block = %s;",
+                    [(block,) for _, block, _ in samples],
+                )
+                composite_time = time_lookups(
+                    cursor,
+                    "SELECT 1 FROM key_bench WHERE id = %s AND purchase_start_time = %s;",
+                    [(i_code, start) for i_code, _, start in samples],
+                )
+
+                block_size = index_size(cursor, "key_bench_block")
+                composite_size = index_size(cursor, "key_bench_composite")
+    finally:
+        release_connection(conn)
+
+    print(f"rows={args.rows} lookups={len(samples)}")
+    print(f"product_info_block index: {block_size / 1024 / 1024:8.1f} MiB  {block_time / len(samples) * 1e6:8.1f} us/lookup")
+    print(f"(i_code, start) index:    {composite_size / 1024 / 1024:8.1f} MiB  {composite_time / len(samples) * 1e6:8.1f} us/lookup")
+
+
+if __name__ == "__main__":
+    main()
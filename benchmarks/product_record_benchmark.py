@@ -0,0 +1,124 @@
+"""
+Memory / latency comparison of the old per-row dicts and ProductRecord.
+
+The old query functions selected eight columns and built a dict per row,
+calling strftime twice per row. The repository selects only the columns the
+formatter needs and builds __slots__ records. Rows are synthesised in the
+shape psycopg2 returns, so no database is needed.
+
+Usage:
+    python -m benchmarks.product_record_benchmark --rows 200000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from database.product_record import ProductRecord
+from database.product_repository import CARD_COLUMNS
+from messages.message_format import format_telegram_message
+
+
+# 舊查詢選取的八個欄位
+OLD_COLUMNS = (
+    "id", "product_name", "brand", "image_url", "price", "countdown", "purchase_start_time", "purchase_end_time"
+)
+
+
+def make_products(count):
+    """
+    Build the stored values of `count` products, by column name.
+    """
+    start = datetime(2025, 1, 1, 10, 0)
+    products = []
+    for index in range(count):
+        products.append({
+            "id": str(10_000_000 + index),
+            "product_name": f"商品名稱 {index}",
+            "brand": f"品牌 {index % 500}",
+            "image_url": f"https://img.momoshop.com.tw/goodsimg/{index}.jpg",
+            "price": 100 + index % 5000,
+            "countdown": index % 300,
+            "purchase_start_time": start + timedelta(minutes=index),
+            "purchase_end_time": start + timedelta(minutes=index, hours=2),
+            "site": "momo",
+        })
+    return products
+
+
+def make_rows(products, columns):
+    """
+    Result rows of a SELECT of `columns`, as psycopg2 returns them.
+    """
+    return [tuple(product[name] for name in columns) for product in products]
+
+
+def build_dicts(rows):
+    """
+    The previous conversion: one dict per row, timestamps formatted eagerly.
+    """
+    products = []
+    for row in rows:
+        products.append({
+            "id": row[0],
+            "product_name": row[1],
+            "brand": row[2],
+            "image_url": row[3],
+            "price": row[4],
+            "countdown": row[5],
+            "purchase_start_time": row[6].strftime("%Y-%m-%d %H:%M:%S"),
+            "purchase_end_time": row[7].strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return products
+
+
+def build_records(rows):
+    """
+    The repository conversion: only the card columns, no timestamp formatting.
+    """
+    names = tuple(column.value for column in CARD_COLUMNS)
+    from_row = ProductRecord.from_row
+    return [from_row(names, row) for row in rows]
+
+
+def measure(name, build, rows):
+    """
+    Time a conversion and measure the memory held by its result.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    products = build(rows)
+    elapsed = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<8} build={elapsed * 1000:8.1f} ms  held={held / 1024 / 1024:8.1f} MiB")
+    return products
+
+
+def main():
+    """
+    Run the comparison.
+    """
+    parser = argparse.ArgumentParser(description="Compare dict rows with ProductRecord.")
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    products = make_products(args.rows)
+    full_rows = make_rows(products, OLD_COLUMNS)
+    # 新的查詢只選取卡片需要的欄位 (CARD_COLUMNS)
+    card_rows = make_rows(products, tuple(column.value for column in CARD_COLUMNS))
+    del products
+
+    print(f"rows={args.rows}")
+    measure("dict", build_dicts, full_rows)
+    records = measure("record", build_records, card_rows)
+
+    start = time.perf_counter()
+    format_telegram_message(records)
+    print(f"format (records) {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark for the watchlist matching engine.
+
+Compares the compiled WatchlistMatcher (Aho-Corasick + sorted price
+thresholds) against checking every rule against every product one by one.
+
+Usage:
+    python -m benchmarks.watchlist_benchmark --rules 5000 --products 2000
+"""
+
+import argparse
+import random
+import string
+import time
+from config.constants import WatchlistRuleType
+from database.product_record import ProductRecord
+from watchlist.matcher import WatchlistMatcher, normalize_text, parse_price
+
+
+def random_word(rng, min_length=2, max_length=6):
+    """
+    Generate a random lowercase word.
+    """
+    length = rng.randint(min_length, max_length)
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def generate_rules(rng, count, vocabulary):
+    """
+    Generate a mix of brand, keyword and price rules.
+    """
+    rule_types = [rule_type.value for rule_type in WatchlistRuleType]
+    rules = []
+    for rule_id in range(1, count + 1):
+        rule_type = rng.choice(rule_types)
+        if rule_type == WatchlistRuleType.PRICE_BELOW.value:
+            pattern = str(rng.randint(100, 20000))
+        else:
+            pattern = rng.choice(vocabulary)
+        rules.append({
+            "id": rule_id,
+            "chat_id": rng.randint(1, count // 3 + 1),
+            "rule_type": rule_type,
+            "pattern": pattern,
+        })
+    return rules
+
+
+def generate_products(rng, count, vocabulary):
+    """
+    Generate products with a brand, a multi-word name and a price.
+    """
+    products = []
+    for product_id in range(count):
+        products.append(ProductRecord(
+            id=str(product_id),
+            brand=" ".join(rng.choice(vocabulary) for _ in range(2)),
+            product_name=" ".join(rng.choice(vocabulary) for _ in range(8)),
+            price=str(rng.randint(50, 30000)),
+        ))
+    return products
+
+
+def naive_match(rules, products):
+    """
+    Reference implementation: test every rule against every product.
+    """
+    matches_by_chat = {}
+    for product in products:
+        brand = normalize_text(product.brand)
+        name = normalize_text(product.product_name)
+        price = parse_price(product.price)
+        for rule in rules:
+            rule_type = rule["rule_type"]
+            if rule_type == WatchlistRuleType.BRAND.value:
+                hit = normalize_text(rule["pattern"]) in brand
+            elif rule_type == WatchlistRuleType.KEYWORD.value:
+                hit = normalize_text(rule["pattern"]) in name
+            else:
+                hit = price is not None and price < float(rule["pattern"])
+            if hit:
+                matches_by_chat.setdefault(rule["chat_id"], set()).add(product.id)
+    return matches_by_chat
+
+
+def main():
+    """
+    Run the benchmark and print timings for both strategies.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark watchlist rule matching.")
+    parser.add_argument("--rules", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [random_word(rng) for _ in range(3000)]
+    rules = generate_rules(rng, args.rules, vocabulary)
+    products = generate_products(rng, args.products, vocabulary)
+
+    start = time.perf_counter()
+    matcher = WatchlistMatcher(rules)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled_matches = matcher.match_products(products)
+    compiled_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected_matches = naive_match(rules, products)
+    naive_time = time.perf_counter() - start
+
+    compiled_sets = {
+        chat_id: {product.id for product, _ in matches}
+        for chat_id, matches in compiled_matches.items()
+    }
+    assert compiled_sets == expected_matches, "compiled matcher disagrees with naive matcher"
+
+    print(f"rules={args.rules} products={args.products} chats_notified={len(compiled_sets)}")
+    print(f"compile:  {compile_time * 1000:8.1f} ms")
+    print(f"compiled: {compiled_time * 1000:8.1f} ms")
+    print(f"naive:    {naive_time * 1000:8.1f} ms")
+    print(f"speedup:  {naive_time / compiled_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+End-to-end load test for the bot's webhook mode.
+
+The script starts a stub Telegram Bot API server, launches
+`telegram_bot.py webhook` pointed at it, then posts recorded Update payloads
+to the local webhook at a configurable concurrency. Each posted update gets
+its own chat id, so the time between posting an update and the stub
+receiving the bot's reply for that chat is the reply latency.
+
+Usage:
+    python -m benchmarks.webhook_load_test --requests 500 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import httpx
+
+DEFAULT_PAYLOADS = os.path.join(os.path.dirname(__file__), "payloads", "updates.json")
+STUB_TOKEN = "123456:LOADTEST"
+WEBHOOK_SECRET = "loadtest-secret"
+REPLY_METHODS = {"sendMessage", "sendPhoto", "sendMediaGroup"}
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    HTTP server of the stub with a listen backlog large enough for the bot's
+    concurrent requests (the default of 5 drops connections under load).
+    """
+
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class StubBotApi:
+    """
+    Minimal Bot API stand-in that answers every method and records replies.
+    """
+
+    def __init__(self):
+        self.replies = {}   # chat_id -> 第一次收到回覆的時間
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self, port):
+        """
+        Start serving in a background thread.
+        """
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode()
+                method = self.path.rsplit("/", 1)[-1]
+                data = parse_body(self.headers.get("Content-Type", ""), body)
+                result = stub.handle(method, data)
+                payload = json.dumps({"ok": True, "result": result}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = StubServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        """
+        Stop the stub server.
+        """
+        if self._server:
+            self._server.shutdown()
+
+    def handle(self, method, data):
+        """
+        Produce a plausible result for a Bot API method.
+        """
+        with self._lock:
+            self.calls += 1
+
+        if method == "getMe":
+            return {"id": 123456, "is_bot": True, "first_name": "LoadTest", "username": "load_test_bot"}
+
+        if method in REPLY_METHODS:
+            chat_id = int(data.get("chat_id", 0))
+            with self._lock:
+                self.replies.setdefault(chat_id, time.perf_counter())
+            message = {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text", ""),
+            }
+            if method == "sendMediaGroup":
+                media = data.get("media", "[]")
+                count = len(json.loads(media) if isinstance(media, str) else media)
+                return [message] * count
+            return message
+
+        return True
+
+
+def parse_body(content_type, body):
+    """
+    Decode a Bot API request body (JSON or form encoded).
+    """
+    if "json" in content_type:
+        return json.loads(body or "{}")
+    return {key: values[0] for key, values in parse_qs(body).items()}
+
+
+def free_port():
+    """
+    Ask the OS for a free TCP port.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    """
+    Block until something is listening on the port.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"Webhook server did not start on port {port}")
+
+
+def build_updates(templates, count):
+    """
+    Clone recorded payloads with unique update ids and chat ids.
+    """
+    updates = []
+    for index in range(count):
+        update = copy.deepcopy(templates[index % len(templates)])
+        chat_id = 1_000_000 + index
+        update["update_id"] = 200_000_000 + index
+        update["message"]["chat"]["id"] = chat_id
+        update["message"]["from"]["id"] = chat_id
+        updates.append((chat_id, update))
+    return updates
+
+
+async def post_updates(webhook_url, updates, concurrency):
+    """
+    Post all updates with bounded concurrency and return per-chat post times
+    and HTTP acknowledgement latencies.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    posted_at = {}
+    ack_latencies = []
+    headers = {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}
+
+    async with httpx.AsyncClient(timeout=30) as client:
+
+        async def post(chat_id, update):
+            async with semaphore:
+                start = time.perf_counter()
+                posted_at[chat_id] = start
+                response = await client.post(webhook_url, json=update, headers=headers)
+                ack_latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        await asyncio.gather(*(post(chat_id, update) for chat_id, update in updates))
+
+    return posted_at, ack_latencies
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(name, values):
+    """
+    Print latency percentiles in milliseconds.
+    """
+    print(
+        f"{name:<6} n={len(values):<5} "
+        f"p50={percentile(values, 50) * 1000:7.1f} ms  "
+        f"p95={percentile(values, 95) * 1000:7.1f} ms  "
+        f"p99={percentile(values, 99) * 1000:7.1f} ms"
+    )
+
+
+def main():
+    """
+    Run the load test.
+    """
+    parser = argparse.ArgumentParser(description="Load test the bot's webhook mode.")
+    parser.add_argument("--payloads", default=DEFAULT_PAYLOADS, help="JSON list of recorded Update payloads")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=16, help="TELEGRAM_CONCURRENT_UPDATES for the bot")
+    parser.add_argument("--reply-timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    with open(args.payloads, encoding="utf-8") as file:
+        templates = json.load(file)
+
+    stub_port = free_port()
+    webhook_port = free_port()
+    stub = StubBotApi()
+    stub.start(stub_port)
+
+    env = dict(os.environ)
+    env.update({
+        "TELEGRAM_API_TOKEN": STUB_TOKEN,
+        "TELEGRAM_BASE_URL": f"http://127.0.0.1:{stub_port}/bot",
+        "TELEGRAM_CONCURRENT_UPDATES": str(args.workers),
+        "TELEGRAM_WEBHOOK_LISTEN": "127.0.0.1",
+        "TELEGRAM_WEBHOOK_PORT": str(webhook_port),
+        "TELEGRAM_WEBHOOK_PATH": "telegram",
+        "TELEGRAM_WEBHOOK_URL": f"http://127.0.0.1:{webhook_port}/telegram",
+        "TELEGRAM_WEBHOOK_SECRET": WEBHOOK_SECRET,
+    })
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    bot_process = subprocess.Popen([sys.executable, "telegram_bot.py", "webhook"], cwd=root, env=env)
+
+    try:
+        wait_for_port(webhook_port)
+        updates = build_updates(templates, args.requests)
+
+        start = time.perf_counter()
+        posted_at, ack_latencies = asyncio.run(
+            post_updates(f"http://127.0.0.1:{webhook_port}/telegram", updates, args.concurrency)
+        )
+
+        deadline = time.monotonic() + args.reply_timeout
+        while len(stub.replies) < len(posted_at) and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        missing = [chat_id for chat_id in posted_at if chat_id not in stub.replies]
+        if missing:
+            sys.exit(
+                f"{len(missing)}/{len(updates)} updates got no reply within {args.reply_timeout:.0f} s "
+                f"(first chat ids: {missing[:5]}); no throughput reported."
+            )
+
+        # 以最後一則回覆的時間計算，不包含等待逾時的時間
+        elapsed = max(stub.replies[chat_id] for chat_id in posted_at) - start
+        reply_latencies = [stub.replies[chat_id] - posted for chat_id, posted in posted_at.items()]
+
+        print(f"updates={len(updates)} concurrency={args.concurrency} workers={args.workers}")
+        report("ack", ack_latencies)
+        report("reply", reply_latencies)
+        print(f"replied={len(reply_latencies)}/{len(updates)} throughput={len(reply_latencies) / elapsed:.1f} updates/s")
+    finally:
+        bot_process.terminate()
+        bot_process.wait(timeout=30)
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
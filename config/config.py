@@ -8,8 +8,8 @@ from dotenv import load_dotenv
 # Load environment variables from a .env file
 load_dotenv()
 
-def get_env_var(var_name):
+def get_env_var(var_name, default=None):
     """
     Retrieve an environment variable's value or return a default value.
     """
-    return os.getenv(var_name)
+    return os.getenv(var_name, default)
@@ -14,6 +14,8 @@ class DatabaseConfig(Enum):
     DB_PASSWORD = "DB_PASSWORD"
     DB_HOST = "DB_HOST"
     DB_PORT = "DB_PORT"
+    DB_POOL_MIN = "DB_POOL_MIN"
+    DB_POOL_MAX = "DB_POOL_MAX"
 
 class EmailConfig(Enum):
     """
@@ -40,6 +42,11 @@ class ProductTable(Enum):
     COUNTDOWN = "countdown"
     ORIGINAL_COUNT = "original_count"
     CATEGORY = "category"
+    FIRST_SEEN = "first_seen"
+    PREVIOUS_PRICE = "previous_price"
+    PRICE_CHANGED_AT = "price_changed_at"
+    SOLD_OUT_AT = "sold_out_at"
+    SITE = "site"
 
 class TelegramConfig(Enum):
     """
@@ -47,4 +54,139 @@ class TelegramConfig(Enum):
     """    
     TELEGRAM_API_TOKEN = "TELEGRAM_API_TOKEN"
     TELEGRAM_CHAT_ID = "TELEGRAM_CHAT_ID"
-    
\ No newline at end of file
+    TELEGRAM_BASE_URL = "TELEGRAM_BASE_URL"
+    TELEGRAM_MODE = "TELEGRAM_MODE"
+    TELEGRAM_CONCURRENT_UPDATES = "TELEGRAM_CONCURRENT_UPDATES"
+    TELEGRAM_WEBHOOK_URL = "TELEGRAM_WEBHOOK_URL"
+    TELEGRAM_WEBHOOK_LISTEN = "TELEGRAM_WEBHOOK_LISTEN"
+    TELEGRAM_WEBHOOK_PORT = "TELEGRAM_WEBHOOK_PORT"
+    TELEGRAM_WEBHOOK_PATH = "TELEGRAM_WEBHOOK_PATH"
+    TELEGRAM_WEBHOOK_SECRET = "TELEGRAM_WEBHOOK_SECRET"
+
+class WatchlistTable(Enum):
+    """
+    Enum for watchlist (user alert rule) table column names.
+    """
+    TABLE_NAME = "watchlists"
+    ID = "id"
+    CHAT_ID = "chat_id"
+    RULE_TYPE = "rule_type"
+    PATTERN = "pattern"
+    CREATED_AT = "created_at"
+
+class WatchlistRuleType(Enum):
+    """
+    Enum for the kinds of watchlist rules a user can register.
+    """
+    BRAND = "brand"          # 品牌包含關鍵字
+    KEYWORD = "keyword"      # 商品名稱包含關鍵字
+    PRICE_BELOW = "price"    # 價格低於指定金額
+
+class MediaCacheTable(Enum):
+    """
+    Enum for the Telegram media (file_id) cache table column names.
+    """
+    TABLE_NAME = "telegram_media_cache"
+    IMAGE_URL = "image_url"
+    FILE_ID = "file_id"
+    FILE_SIZE = "file_size"
+    HITS = "hits"
+    CREATED_AT = "created_at"
+    LAST_USED = "last_used"
+
+class PartitionConfig(Enum):
+    """
+    Enum for products table partition maintenance settings.
+    """
+    PARTITION_MONTHS_AHEAD = "PARTITION_MONTHS_AHEAD"
+    PARTITION_RETENTION_MONTHS = "PARTITION_RETENTION_MONTHS"
+    PARTITION_ARCHIVE_DIR = "PARTITION_ARCHIVE_DIR"
+
+class PriceStatsTable(Enum):
+    """
+    Enum for the per-product price statistics table column names.
+    """
+    TABLE_NAME = "product_price_stats"
+    I_CODE = "i_code"
+    MIN_PRICE = "min_price"
+    MAX_PRICE = "max_price"
+    LAST_PRICE = "last_price"
+    TIMES_SEEN = "times_seen"
+    FIRST_SEEN = "first_seen"
+    LAST_SEEN = "last_seen"
+    SITE = "site"
+
+class DeliveryWatermarkTable(Enum):
+    """
+    Enum for the notification delivery watermark table column names.
+    """
+    TABLE_NAME = "delivery_watermarks"
+    CHANNEL = "channel"
+    SUBSCRIBER = "subscriber"
+    DELIVERED_AT = "delivered_at"
+
+class DeliveryChannel(Enum):
+    """
+    Enum for the notification delivery channels.
+    """
+    EMAIL = "email"
+    TELEGRAM = "telegram"
+    BOT = "bot"
+
+class ChangeType(Enum):
+    """
+    Enum for the kinds of product changes included in a digest.
+    """
+    NEW = "new"
+    PRICE_DROP = "price_drop"
+    SOLD_OUT = "sold_out"
+
+class ScraperConfig(Enum):
+    """
+    Enum for scraper configuration settings.
+    """
+    SCRAPER_SITES = "SCRAPER_SITES"
+    SCRAPE_DEADLINE_SECONDS = "SCRAPE_DEADLINE_SECONDS"
+
+class Site(Enum):
+    """
+    Enum for the identifiers of the scraped shopping sites.
+    """
+    MOMO = "momo"
+
+class OutboxTable(Enum):
+    """
+    Enum for the notification outbox table column names.
+    """
+    TABLE_NAME = "notification_outbox"
+    ID = "id"
+    CHANNEL = "channel"
+    RECIPIENT = "recipient"
+    IDEMPOTENCY_KEY = "idempotency_key"
+    PAYLOAD = "payload"
+    STATUS = "status"
+    ATTEMPTS = "attempts"
+    NEXT_ATTEMPT_AT = "next_attempt_at"
+    CLAIMED_AT = "claimed_at"
+    LAST_ERROR = "last_error"
+    CREATED_AT = "created_at"
+    SENT_AT = "sent_at"
+
+class OutboxStatus(Enum):
+    """
+    Enum for the delivery states of an outbox message.
+    """
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+
+class OutboxConfig(Enum):
+    """
+    Enum for delivery worker configuration settings.
+    """
+    OUTBOX_BATCH_SIZE = "OUTBOX_BATCH_SIZE"
+    OUTBOX_POLL_SECONDS = "OUTBOX_POLL_SECONDS"
+    OUTBOX_MAX_ATTEMPTS = "OUTBOX_MAX_ATTEMPTS"
+    OUTBOX_TELEGRAM_RATE = "OUTBOX_TELEGRAM_RATE"
+    OUTBOX_EMAIL_RATE = "OUTBOX_EMAIL_RATE"
@@ -4,8 +4,11 @@ such as inserting, updating, and querying product data.
 """
 
 from datetime import datetime
-from database.db_connection import connect_db
-from config.constants import ProductTable
+from psycopg2.extras import execute_values
+from database.db_connection import get_connection, release_connection, transaction
+from config.constants import ProductTable, PriceStatsTable, Site
+
+UPDATE_BATCH_SIZE = 200  # 每批更新的商品數量
 
 def execute_query(query, params=None, fetch=False, fetch_all=False):
     """
@@ -16,7 +19,7 @@ def execute_query(query, params=None, fetch=False, fetch_all=False):
     :param fetch: Whether to fetch a single result.
     :param fetch_all: Whether to fetch all results.
     """    
-    conn = connect_db()
+    conn = get_connection()
     if conn is None:
         print("Database connection failed.")
         return None
@@ -34,11 +37,31 @@ def execute_query(query, params=None, fetch=False, fetch_all=False):
     except Exception as e:
         print(f"Database query error: {e}")
     finally:
-        if conn:
-            conn.close()
+        release_connection(conn)
     return None
 
 
+def parse_price(price):
+    """
+    Price as stored, or None when it is missing or unparseable (e.g. "price not found").
+    """
+    try:
+        return None if price is None else float(str(price).replace(",", ""))
+    except ValueError:
+        return None
+
+
+def parse_countdown(countdown):
+    """
+    Countdown as stored (the scraped value may contain thousands separators),
+    or None when it is missing or unparseable (e.g. "countdown not found").
+    """
+    try:
+        return None if countdown is None else int(str(countdown).replace(",", ""))
+    except ValueError:
+        return None
+
+
 def build_query(table, columns, condition):
     """
     Builds an UPDATE SQL query based on the provided table, columns, and condition.
@@ -50,158 +73,157 @@ def build_query(table, columns, condition):
     return f"""UPDATE "{table}" SET {set_clause} WHERE {condition};"""
 
 
-def is_product_in_database(product_info_block):
+def build_price_stats_upsert(source, new_sighting):
     """
-    Checks if a product exists in the database based on the product_info_block.
-    """    
-    query = f"""
-        SELECT 1 FROM "{ProductTable.TABLE_NAME.value}"     
-        WHERE "{ProductTable.PRODUCT_INFO_BLOCK.value}" = %s;
-    """
-    result = execute_query(query, (product_info_block,), fetch=True)
+    Builds the statement that folds rows of the `source` CTE (columns: the
+    product site, id, price and last_updated) into the per-product price statistics.
 
-    return result is not None
+    It is appended to the INSERT / UPDATE of the product itself, so the
+    statistics are written in the same statement and transaction. Rows of
+    the same product (several flash sales in one batch) are folded together,
+    as ON CONFLICT cannot update a row twice in one statement.
 
+    :param source: Name of the CTE returning the written product rows.
+    :param new_sighting: Whether the rows are new flash sales (counted in times_seen).
+    """
+    stats = PriceStatsTable
+    times_seen = "COUNT(*)" if new_sighting else "1"
+    times_seen_increment = f'EXCLUDED."{stats.TIMES_SEEN.value}"' if new_sighting else "0"
+    price = f'"{ProductTable.PRICE.value}"'
+    last_updated = f'"{ProductTable.LAST_UPDATED.value}"'
+    return f"""
+        INSERT INTO "{stats.TABLE_NAME.value}" AS stats (
+            "{stats.SITE.value}", "{stats.I_CODE.value}", "{stats.MIN_PRICE.value}", "{stats.MAX_PRICE.value}", "{stats.LAST_PRICE.value}",
+            "{stats.TIMES_SEEN.value}", "{stats.FIRST_SEEN.value}", "{stats.LAST_SEEN.value}")
+        SELECT "{ProductTable.SITE.value}", "{ProductTable.ID.value}", MIN({price}), MAX({price}),
+            (ARRAY_AGG({price} ORDER BY {last_updated} DESC))[1], {times_seen}, MIN({last_updated}), MAX({last_updated})
+        FROM {source}
+        WHERE {price} IS NOT NULL
+        GROUP BY "{ProductTable.SITE.value}", "{ProductTable.ID.value}"
+        ON CONFLICT ("{stats.SITE.value}", "{stats.I_CODE.value}") DO UPDATE
+        SET "{stats.MIN_PRICE.value}" = LEAST(stats."{stats.MIN_PRICE.value}", EXCLUDED."{stats.MIN_PRICE.value}"),
+            "{stats.MAX_PRICE.value}" = GREATEST(stats."{stats.MAX_PRICE.value}", EXCLUDED."{stats.MAX_PRICE.value}"),
+            "{stats.LAST_PRICE.value}" = EXCLUDED."{stats.LAST_PRICE.value}",
+            "{stats.TIMES_SEEN.value}" = stats."{stats.TIMES_SEEN.value}" + {times_seen_increment},
+            "{stats.LAST_SEEN.value}" = EXCLUDED."{stats.LAST_SEEN.value}";
+    """
 
 
-def insert_product_info(product_info):
+def insert_product_info(product_info, cursor=None):
     """
-    Inserts product information in the database.
+    Inserts product information (a ProductRecord) in the database.
+
+    When a cursor is given the insert runs in the caller's transaction and
+    errors propagate, so the caller's other writes are rolled back with it.
     """    
-    processed_countdown = product_info["countdown"].replace(",", "")
+    processed_countdown = parse_countdown(product_info.countdown)
 
-    categories = ', '.join(product_info.get("categories", ["其他"]))
+    categories = ', '.join(product_info.categories if product_info.categories is not None else ["其他"])
 
 
-    # Insert new product information
+    # Insert new product information; the price statistics are updated
+    # only when the row was actually inserted
     insert_query = (
-        f"""INSERT INTO "{ProductTable.TABLE_NAME.value}" (
+        f"""WITH inserted AS (
+        INSERT INTO "{ProductTable.TABLE_NAME.value}" (
         "{ProductTable.ID.value}", "{ProductTable.PRODUCT_INFO_BLOCK.value}", "{ProductTable.PRODUCT_NAME.value}", "{ProductTable.BRAND.value}", 
         "{ProductTable.IMAGE_URL.value}", "{ProductTable.PRICE.value}", "{ProductTable.PURCHASE_START_TIME.value}", 
         "{ProductTable.PURCHASE_END_TIME.value}", "{ProductTable.COUNTDOWN.value}", "{ProductTable.ORIGINAL_COUNT.value}", 
-        "{ProductTable.LAST_UPDATED.value}", "{ProductTable.CATEGORY.value}")
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT ("{ProductTable.PRODUCT_INFO_BLOCK.value}") DO NOTHING;
+        "{ProductTable.LAST_UPDATED.value}", "{ProductTable.CATEGORY.value}", "{ProductTable.FIRST_SEEN.value}", "{ProductTable.SITE.value}")
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT ("{ProductTable.SITE.value}", "{ProductTable.ID.value}", "{ProductTable.PURCHASE_START_TIME.value}", "{ProductTable.PURCHASE_END_TIME.value}") DO NOTHING
+        RETURNING "{ProductTable.SITE.value}", "{ProductTable.ID.value}", "{ProductTable.PRICE.value}", "{ProductTable.LAST_UPDATED.value}"
+        )
         """
+        + build_price_stats_upsert("inserted", new_sighting=True)
     )
     
-    try:
-        execute_query(insert_query, (
-            product_info["id"],     
-            product_info["product_info_block"],
-            product_info["product_name"],
-            product_info["brand"],
-            product_info["image"],
-            product_info["price"],
-            product_info["purchase_start_time"],
-            product_info["purchase_end_time"],
-            processed_countdown,
-            processed_countdown,    
-            datetime.now(),                
-            categories
-        ))
-    except Exception as e:
-        print(f"Error inserting or updating product: {e}")
-
-
-# Upsate product information
-def update_product_info(product_info):
-    update_fields = []
-    update_values = []
-    product_info_block = product_info.get("product_info_block")
+    now = datetime.now()
+    insert_values = (
+        str(product_info.id),     
+        product_info.product_info_block,
+        product_info.product_name,
+        product_info.brand,
+        product_info.image_url,
+        parse_price(product_info.price),
+        product_info.purchase_start_time,
+        product_info.purchase_end_time,
+        processed_countdown,
+        processed_countdown,    
+        now,                
+        categories,
+        now,
+        product_info.site or Site.MOMO.value
+    )
 
-    if not product_info_block:
-        print("No PRODUCT_INFO_BLOCK provided. Skipping update.")
+    if cursor is not None:
+        cursor.execute(insert_query, insert_values)
         return
-    
-    if "categories" in product_info and product_info["categories"]:
-        update_fields.append(f'"{ProductTable.CATEGORY.value}" = %s')
-        update_values.append(", ".join(product_info["categories"]))
-    
-    if "price" in product_info:       
-        update_fields.append(f'"{ProductTable.PRICE.value}" = %s')
-        update_values.append(float(product_info["price"])) 
-    
-    if "countdown" in product_info:
-        countdown_value = str(product_info["countdown"]).replace(",", "")
-        update_fields.append(f'"{ProductTable.COUNTDOWN.value}" = %s')
-        update_values.append(int(countdown_value))
-
-    update_fields.append(f'"{ProductTable.LAST_UPDATED.value}" = %s')
-    update_values.append(datetime.now())
-
-    update_query = f"""
-        UPDATE "{ProductTable.TABLE_NAME.value}"
-        SET {", ".join(update_fields)}
-        WHERE "{ProductTable.PRODUCT_INFO_BLOCK.value}" = %s;
-    """
-    update_values.append(product_info_block)
-
-    execute_query(update_query, tuple(update_values))
 
+    try:
+        execute_query(insert_query, insert_values)
+    except Exception as e:
+        print(f"Error inserting or updating product: {e}")
 
-def get_all_products_today():
-    """
-    Fetches all products whose purchase end time is today.
-    """
-    query = f"""
-        SELECT DISTINCT ON ("{ProductTable.ID.value}")
-            "{ProductTable.ID.value}", "{ProductTable.PRODUCT_NAME.value}", "{ProductTable.BRAND.value}", 
-            "{ProductTable.IMAGE_URL.value}", "{ProductTable.PRICE.value}", 
-            "{ProductTable.COUNTDOWN.value}", "{ProductTable.PURCHASE_START_TIME.value}", 
-            "{ProductTable.PURCHASE_END_TIME.value}"
-        FROM "{ProductTable.TABLE_NAME.value}"
-        WHERE DATE("{ProductTable.PURCHASE_END_TIME.value}") = CURRENT_DATE;
-    """
-    results = execute_query(query, fetch_all=True)
 
-    products = []
-    for row in results:
-        product = {
-            "id": row[0],
-            "product_name": row[1],
-            "brand": row[2],
-            "image_url": row[3],
-            "price": row[4],
-            "countdown": row[5],
-            "purchase_start_time": row[6].strftime("%Y-%m-%d %H:%M:%S"),
-            "purchase_end_time": row[7].strftime("%Y-%m-%d %H:%M:%S"),
-        }
-        products.append(product)
-
-    return products    
-
-def get_products_with_empty_category():
+def update_product_batch(products, batch_size=UPDATE_BATCH_SIZE):
     """
-    Fetches products that have empty categories.
+    Updates many ProductRecords with one statement per batch, each batch in
+    its own transaction. Fields that are None keep their stored value; a
+    price change keeps the previous price and its time, a countdown reaching
+    0 records the sold-out time, and the price statistics are updated in the
+    same statement. An unparseable price or countdown is treated as None.
+    Returns the number of products written.
     """
+    P = ProductTable
     query = f"""
-        SELECT "{ProductTable.ID.value}", "{ProductTable.PRODUCT_NAME.value}", "{ProductTable.BRAND.value}", 
-            "{ProductTable.IMAGE_URL.value}", "{ProductTable.PRICE.value}", 
-            "{ProductTable.COUNTDOWN.value}", "{ProductTable.PURCHASE_START_TIME.value}", 
-            "{ProductTable.PURCHASE_END_TIME.value}", "{ProductTable.PRODUCT_INFO_BLOCK.value}"
-        FROM "{ProductTable.TABLE_NAME.value}"
-        WHERE "{ProductTable.CATEGORY.value}" = '';
-    """
+        WITH changes ("{P.SITE.value}", "{P.ID.value}", "{P.PURCHASE_START_TIME.value}", "{P.PURCHASE_END_TIME.value}",
+            "{P.PRICE.value}", "{P.COUNTDOWN.value}", "{P.CATEGORY.value}", "{P.LAST_UPDATED.value}") AS (VALUES %s),
+        updated AS (
+            UPDATE "{P.TABLE_NAME.value}" AS product
+            SET "{P.PREVIOUS_PRICE.value}" = CASE WHEN changes."{P.PRICE.value}" IS NOT NULL
+                    AND product."{P.PRICE.value}" IS DISTINCT FROM changes."{P.PRICE.value}"
+                    THEN product."{P.PRICE.value}" ELSE product."{P.PREVIOUS_PRICE.value}" END,
+                "{P.PRICE_CHANGED_AT.value}" = CASE WHEN changes."{P.PRICE.value}" IS NOT NULL
+                    AND product."{P.PRICE.value}" IS DISTINCT FROM changes."{P.PRICE.value}"
+                    THEN changes."{P.LAST_UPDATED.value}" ELSE product."{P.PRICE_CHANGED_AT.value}" END,
+                "{P.PRICE.value}" = COALESCE(changes."{P.PRICE.value}", product."{P.PRICE.value}"),
+                "{P.SOLD_OUT_AT.value}" = CASE WHEN changes."{P.COUNTDOWN.value}" = 0
+                    AND COALESCE(product."{P.COUNTDOWN.value}", 1) <> 0
+                    THEN changes."{P.LAST_UPDATED.value}" ELSE product."{P.SOLD_OUT_AT.value}" END,
+                "{P.COUNTDOWN.value}" = COALESCE(changes."{P.COUNTDOWN.value}", product."{P.COUNTDOWN.value}"),
+                "{P.CATEGORY.value}" = COALESCE(changes."{P.CATEGORY.value}", product."{P.CATEGORY.value}"),
+                "{P.LAST_UPDATED.value}" = changes."{P.LAST_UPDATED.value}"
+            FROM changes
+            WHERE product."{P.SITE.value}" = changes."{P.SITE.value}" AND product."{P.ID.value}" = changes."{P.ID.value}"
+            AND product."{P.PURCHASE_START_TIME.value}" = changes."{P.PURCHASE_START_TIME.value}"
+            AND product."{P.PURCHASE_END_TIME.value}" = changes."{P.PURCHASE_END_TIME.value}"
+            RETURNING product."{P.SITE.value}", product."{P.ID.value}", product."{P.PRICE.value}", product."{P.LAST_UPDATED.value}"
+        )""" + build_price_stats_upsert("updated", new_sighting=False)
+    template = "(%s, %s, %s::timestamptz, %s::timestamptz, %s::integer, %s::integer, %s, %s::timestamptz)"
+
+    now = datetime.now()
+    rows = []
+    for product_info in products:
+        if not product_info.id or product_info.purchase_start_time is None or product_info.purchase_end_time is None:
+            print("No product key (i_code, purchase_start_time, purchase_end_time) provided. Skipping update.")
+            continue
+        rows.append((
+            product_info.site or Site.MOMO.value,
+            str(product_info.id),
+            product_info.purchase_start_time,
+            product_info.purchase_end_time,
+            parse_price(product_info.price),
+            parse_countdown(product_info.countdown),
+            ", ".join(product_info.categories) if product_info.categories else None,
+            now,
+        ))
 
-    results = execute_query(query, fetch_all=True) 
+    for i in range(0, len(rows), batch_size):
+        with transaction() as cursor:
+            execute_values(cursor, query, rows[i:i + batch_size], template=template, page_size=batch_size)
 
-    products = []
-    for row in results:
-        product = {
-            "id": row[0],
-            "product_name": row[1],
-            "brand": row[2],
-            "image_url": row[3],
-            "price": row[4],
-            "countdown": row[5],
-            "purchase_start_time": row[6].strftime("%Y-%m-%d %H:%M:%S"),
-            "purchase_end_time": row[7].strftime("%Y-%m-%d %H:%M:%S"),
-            "product_info_block": row[8],
-        }
-        products.append(product)
-
-    return products    
+    return len(rows)
 
 
 def get_all_categories(): 
@@ -219,31 +241,4 @@ def get_all_categories():
     for row in results:
         categories.append(row[0])
     
-    return categories    
-
-
-def get_products_by_category(category):
-    """
-    Fetches products by a specific category.
-    """    
-    query = f"""
-        SELECT "{ProductTable.ID.value}", "{ProductTable.PRODUCT_NAME.value}", "{ProductTable.BRAND.value}", "{ProductTable.PRICE.value}"
-        FROM "{ProductTable.TABLE_NAME.value}"
-        WHERE "{ProductTable.CATEGORY.value}" = %s
-        AND DATE("{ProductTable.PURCHASE_END_TIME.value}") = CURRENT_DATE;
-    """
-
-    results = execute_query(query, (category,), fetch_all=True)
-
-
-    products = []
-    for row in results:
-        product = {
-            "id": row[0],
-            "product_name": row[1],
-            "brand": row[2],
-            "price": row[3],
-        }
-        products.append(product)
-    
-    return products    
\ No newline at end of file
+    return categories
@@ -1,12 +1,38 @@
 """
 This module provides a function to establish a connection to a PostgreSQL database
 using the psycopg2 library and environment variables for configuration.
+
+Connections are borrowed from a process-wide pool, so the scheduler jobs and the
+bot share the same connections when they run in one process.
 """
 
+import threading
+from contextlib import contextmanager
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 from config.constants import DatabaseConfig
 from config.config import get_env_var
 
+DEFAULT_POOL_MIN = 1
+DEFAULT_POOL_MAX = 20   # 不少於機器人同時處理的 update 數量 (TELEGRAM_CONCURRENT_UPDATES)
+POOL_WAIT_SECONDS = 30  # 連線都借出時等待歸還的秒數
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_params():
+    """
+    Read the database connection parameters from environment variables.
+    """
+    return {
+        "dbname": get_env_var(DatabaseConfig.DB_NAME.value),
+        "user": get_env_var(DatabaseConfig.DB_USER.value),
+        "password": get_env_var(DatabaseConfig.DB_PASSWORD.value),
+        "host": get_env_var(DatabaseConfig.DB_HOST.value),
+        "port": get_env_var(DatabaseConfig.DB_PORT.value),
+    }
+
 
 def connect_db():
     """
@@ -16,14 +42,93 @@ def connect_db():
     specified in the `DatabaseConfig` constants.
     """
     try:
-        conn = psycopg2.connect(
-            dbname=get_env_var(DatabaseConfig.DB_NAME.value),
-            user=get_env_var(DatabaseConfig.DB_USER.value),
-            password=get_env_var(DatabaseConfig.DB_PASSWORD.value),
-            host=get_env_var(DatabaseConfig.DB_HOST.value),
-            port=get_env_var(DatabaseConfig.DB_PORT.value)
-        )
+        conn = psycopg2.connect(**get_connection_params())
         return conn
     except psycopg2.Error as e:
         print(f"資料庫連線錯誤: {e}")
         return None
+
+
+def get_pool():
+    """
+    Return the shared connection pool, creating it on first use.
+
+    ThreadedConnectionPool raises PoolError as soon as every connection is
+    borrowed, so borrowing goes through a semaphore with one slot per
+    connection (`pool.slots`) and waits for a connection to be returned.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                max_connections = int(get_env_var(DatabaseConfig.DB_POOL_MAX.value, DEFAULT_POOL_MAX))
+                pool = ThreadedConnectionPool(
+                    int(get_env_var(DatabaseConfig.DB_POOL_MIN.value, DEFAULT_POOL_MIN)),
+                    max_connections,
+                    **get_connection_params()
+                )
+                pool.slots = threading.BoundedSemaphore(max_connections)
+                _pool = pool
+    return _pool
+
+
+def get_connection():
+    """
+    Borrow a connection from the shared pool, waiting up to
+    POOL_WAIT_SECONDS when every connection is in use.
+
+    Raises PoolError if none is returned in time; returns None if the
+    database cannot be reached.
+    """
+    pool = get_pool()
+    if not pool.slots.acquire(timeout=POOL_WAIT_SECONDS):
+        raise PoolError(f"Connection pool exhausted: no connection returned within {POOL_WAIT_SECONDS} seconds.")
+
+    try:
+        return pool.getconn()
+    except psycopg2.Error as e:
+        pool.slots.release()
+        print(f"資料庫連線錯誤: {e}")
+        return None
+
+
+def release_connection(conn):
+    """
+    Return a borrowed connection to the shared pool.
+    """
+    pool = _pool
+    if conn is None or pool is None:
+        return
+    try:
+        pool.putconn(conn, close=bool(conn.closed))
+    finally:
+        pool.slots.release()
+
+
+@contextmanager
+def transaction():
+    """
+    Borrow a connection and yield a cursor whose statements are committed
+    together when the block exits, or rolled back if it raises.
+    """
+    conn = get_connection()
+    if conn is None:
+        raise psycopg2.OperationalError("Database connection failed.")
+
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                yield cursor
+    finally:
+        release_connection(conn)
+
+
+def close_pool():
+    """
+    Close every connection in the shared pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
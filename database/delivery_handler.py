@@ -0,0 +1,41 @@
+"""
+This module handles the delivery watermarks: for each notification channel
+and subscriber, the time up to which product changes were already delivered.
+"""
+
+from database.database_handler import execute_query
+from config.constants import DeliveryWatermarkTable
+
+
+def get_delivery_watermark(channel, subscriber):
+    """
+    Returns the time of the last delivery to a subscriber, or None if nothing was delivered yet.
+    """
+    query = f"""
+        SELECT "{DeliveryWatermarkTable.DELIVERED_AT.value}"
+        FROM "{DeliveryWatermarkTable.TABLE_NAME.value}"
+        WHERE "{DeliveryWatermarkTable.CHANNEL.value}" = %s AND "{DeliveryWatermarkTable.SUBSCRIBER.value}" = %s;
+    """
+    result = execute_query(query, (channel, str(subscriber)), fetch=True)
+
+    return result[0] if result else None
+
+
+def set_delivery_watermark(channel, subscriber, delivered_at, cursor=None):
+    """
+    Records that every change up to delivered_at was delivered to a subscriber.
+    A cursor runs the update in the caller's transaction.
+    """
+    query = f"""
+        INSERT INTO "{DeliveryWatermarkTable.TABLE_NAME.value}" (
+            "{DeliveryWatermarkTable.CHANNEL.value}", "{DeliveryWatermarkTable.SUBSCRIBER.value}",
+            "{DeliveryWatermarkTable.DELIVERED_AT.value}")
+        VALUES (%s, %s, %s)
+        ON CONFLICT ("{DeliveryWatermarkTable.CHANNEL.value}", "{DeliveryWatermarkTable.SUBSCRIBER.value}")
+        DO UPDATE SET "{DeliveryWatermarkTable.DELIVERED_AT.value}" = EXCLUDED."{DeliveryWatermarkTable.DELIVERED_AT.value}";
+    """
+    params = (channel, str(subscriber), delivered_at)
+    if cursor is not None:
+        cursor.execute(query, params)
+        return
+    execute_query(query, params)
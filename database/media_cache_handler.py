@@ -0,0 +1,136 @@
+"""
+This module handles database operations for the Telegram media cache,
+which maps a product image_url to the file_id Telegram returned after
+the first upload, so later sends can reuse it.
+"""
+
+from datetime import datetime
+from database.database_handler import execute_query
+from config.constants import MediaCacheTable, ProductTable
+
+MEDIA_RETENTION_DAYS = 1  # 商品結束搶購後保留快取的天數
+
+
+def get_cached_file_ids(image_urls):
+    """
+    Fetches cached file ids for the given image urls.
+
+    Returns {image_url: (file_id, file_size)} for the urls found in the cache.
+    """
+    if not image_urls:
+        return {}
+
+    query = f"""
+        SELECT "{MediaCacheTable.IMAGE_URL.value}", "{MediaCacheTable.FILE_ID.value}", "{MediaCacheTable.FILE_SIZE.value}"
+        FROM "{MediaCacheTable.TABLE_NAME.value}"
+        WHERE "{MediaCacheTable.IMAGE_URL.value}" = ANY(%s);
+    """
+    results = execute_query(query, (list(image_urls),), fetch_all=True) or []
+
+    cached = {}
+    for row in results:
+        cached[row[0]] = (row[1], row[2] or 0)
+
+    return cached
+
+
+def save_file_ids(entries):
+    """
+    Stores newly uploaded file ids.
+
+    :param entries: A list of (image_url, file_id, file_size) tuples; when an
+        image_url appears more than once the last entry is kept.
+    """
+    # 同一組相簿可能有共用圖片的商品，ON CONFLICT 無法在同一語句更新同一列兩次
+    entries = list({entry[0]: entry for entry in entries}.values())
+    if not entries:
+        return
+
+    now = datetime.now()
+    values_clause = ", ".join(["(%s, %s, %s, 0, %s, %s)"] * len(entries))
+    params = []
+    for image_url, file_id, file_size in entries:
+        params.extend([image_url, file_id, file_size, now, now])
+
+    query = f"""
+        INSERT INTO "{MediaCacheTable.TABLE_NAME.value}" (
+            "{MediaCacheTable.IMAGE_URL.value}", "{MediaCacheTable.FILE_ID.value}", "{MediaCacheTable.FILE_SIZE.value}",
+            "{MediaCacheTable.HITS.value}", "{MediaCacheTable.CREATED_AT.value}", "{MediaCacheTable.LAST_USED.value}")
+        VALUES {values_clause}
+        ON CONFLICT ("{MediaCacheTable.IMAGE_URL.value}") DO UPDATE
+        SET "{MediaCacheTable.FILE_ID.value}" = EXCLUDED."{MediaCacheTable.FILE_ID.value}",
+            "{MediaCacheTable.FILE_SIZE.value}" = EXCLUDED."{MediaCacheTable.FILE_SIZE.value}",
+            "{MediaCacheTable.LAST_USED.value}" = EXCLUDED."{MediaCacheTable.LAST_USED.value}";
+    """
+    execute_query(query, tuple(params))
+
+
+def record_cache_hits(image_urls):
+    """
+    Increments the hit counter of cached images that were reused.
+    """
+    if not image_urls:
+        return
+
+    query = f"""
+        UPDATE "{MediaCacheTable.TABLE_NAME.value}"
+        SET "{MediaCacheTable.HITS.value}" = "{MediaCacheTable.HITS.value}" + 1,
+            "{MediaCacheTable.LAST_USED.value}" = %s
+        WHERE "{MediaCacheTable.IMAGE_URL.value}" = ANY(%s);
+    """
+    execute_query(query, (datetime.now(), list(image_urls)))
+
+
+def delete_file_ids(image_urls):
+    """
+    Deletes cached file ids that Telegram no longer accepts.
+    """
+    if not image_urls:
+        return
+
+    query = f"""
+        DELETE FROM "{MediaCacheTable.TABLE_NAME.value}"
+        WHERE "{MediaCacheTable.IMAGE_URL.value}" = ANY(%s);
+    """
+    execute_query(query, (list(image_urls),))
+
+
+def evict_expired_media(retention_days=MEDIA_RETENTION_DAYS):
+    """
+    Deletes cached file ids whose products are no longer on sale.
+
+    Returns the number of evicted entries.
+    """
+    query = f"""
+        WITH evicted AS (
+            DELETE FROM "{MediaCacheTable.TABLE_NAME.value}" AS cache
+            WHERE NOT EXISTS (
+                SELECT 1 FROM "{ProductTable.TABLE_NAME.value}" AS product
+                WHERE product."{ProductTable.IMAGE_URL.value}" = cache."{MediaCacheTable.IMAGE_URL.value}"
+                AND product."{ProductTable.PURCHASE_END_TIME.value}" >= NOW() - make_interval(days => %s)
+            )
+            RETURNING 1
+        )
+        SELECT COUNT(*) FROM evicted;
+    """
+    result = execute_query(query, (retention_days,), fetch=True)
+
+    return result[0] if result else 0
+
+
+def get_media_cache_stats():
+    """
+    Fetches cache size and the total upload bytes avoided by cache hits.
+    """
+    query = f"""
+        SELECT COUNT(*),
+            COALESCE(SUM("{MediaCacheTable.HITS.value}"), 0),
+            COALESCE(SUM("{MediaCacheTable.HITS.value}"::BIGINT * "{MediaCacheTable.FILE_SIZE.value}"), 0)
+        FROM "{MediaCacheTable.TABLE_NAME.value}";
+    """
+    result = execute_query(query, fetch=True)
+
+    if not result:
+        return {"entries": 0, "hits": 0, "bytes_avoided": 0}
+
+    return {"entries": result[0], "hits": result[1], "bytes_avoided": result[2]}
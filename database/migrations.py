@@ -0,0 +1,289 @@
+"""
+This module applies schema migrations in order. Each migration runs in its
+own transaction and is recorded in the schema_migrations table, so running
+the module again only applies the new ones.
+
+    python -m database.migrations
+"""
+
+from datetime import datetime
+from database.db_connection import get_connection, release_connection
+from config.constants import (
+    ProductTable, WatchlistTable, MediaCacheTable, PriceStatsTable, DeliveryWatermarkTable, Site, OutboxTable, OutboxStatus
+)
+
+MIGRATIONS_TABLE = "schema_migrations"
+PRODUCT_KEY_INDEX = "products_i_code_start_key"
+LEGACY_TABLE = "products_unpartitioned"
+
+P = ProductTable
+W = WatchlistTable
+M = MediaCacheTable
+S = PriceStatsTable
+D = DeliveryWatermarkTable
+O = OutboxTable
+
+MIGRATIONS = [
+    (
+        "001_watchlists_and_media_cache",
+        f"""
+        CREATE TABLE IF NOT EXISTS "{W.TABLE_NAME.value}" (
+            "{W.ID.value}" SERIAL PRIMARY KEY,
+            "{W.CHAT_ID.value}" BIGINT NOT NULL,
+            "{W.RULE_TYPE.value}" VARCHAR(10) NOT NULL,
+            "{W.PATTERN.value}" TEXT NOT NULL,
+            "{W.CREATED_AT.value}" TIMESTAMPTZ,
+            UNIQUE ("{W.CHAT_ID.value}", "{W.RULE_TYPE.value}", "{W.PATTERN.value}")
+        );
+
+        CREATE TABLE IF NOT EXISTS "{M.TABLE_NAME.value}" (
+            "{M.IMAGE_URL.value}" TEXT PRIMARY KEY,
+            "{M.FILE_ID.value}" TEXT NOT NULL,
+            "{M.FILE_SIZE.value}" INTEGER,
+            "{M.HITS.value}" INTEGER DEFAULT 0,
+            "{M.CREATED_AT.value}" TIMESTAMPTZ,
+            "{M.LAST_USED.value}" TIMESTAMPTZ
+        );
+        """,
+    ),
+    (
+        # 以 (i_code, purchase_start_time) 取代 product_info_block 作為去重鍵
+        "002_compact_product_key",
+        f"""
+        -- 全新的資料庫: 建立原始的 products 資料表，後續 migration 再逐步升級
+        CREATE TABLE IF NOT EXISTS "{P.TABLE_NAME.value}" (
+            "{P.ID.value}" INTEGER,
+            "{P.PRODUCT_INFO_BLOCK.value}" TEXT UNIQUE,
+            "{P.PRODUCT_NAME.value}" TEXT,
+            "{P.BRAND.value}" TEXT,
+            "{P.IMAGE_URL.value}" TEXT,
+            "{P.PRICE.value}" INTEGER,
+            "{P.PURCHASE_START_TIME.value}" TIMESTAMPTZ,
+            "{P.PURCHASE_END_TIME.value}" TIMESTAMPTZ,
+            "{P.LAST_UPDATED.value}" TIMESTAMPTZ,
+            "{P.COUNTDOWN.value}" INTEGER,
+            "{P.ORIGINAL_COUNT.value}" INTEGER,
+            "{P.CATEGORY.value}" VARCHAR(10)
+        );
+
+        -- 回填: 舊資料的搶購開始時間可由 product_info_block 的第一段取得
+        UPDATE "{P.TABLE_NAME.value}"
+        SET "{P.PURCHASE_START_TIME.value}" = split_part("{P.PRODUCT_INFO_BLOCK.value}", '|', 1)::timestamp
+        WHERE "{P.PURCHASE_START_TIME.value}" IS NULL
+        AND split_part("{P.PRODUCT_INFO_BLOCK.value}", '|', 1) ~ '^\\d{{4}}-\\d{{2}}-\\d{{2}} ';
+
+        -- 同一檔搶購重複的資料只保留最後更新的一筆
+        DELETE FROM "{P.TABLE_NAME.value}" AS older
+        USING "{P.TABLE_NAME.value}" AS newer
+        WHERE older."{P.ID.value}" = newer."{P.ID.value}"
+        AND older."{P.PURCHASE_START_TIME.value}" = newer."{P.PURCHASE_START_TIME.value}"
+        AND (COALESCE(older."{P.LAST_UPDATED.value}", '-infinity'), older.ctid)
+            < (COALESCE(newer."{P.LAST_UPDATED.value}", '-infinity'), newer.ctid);
+
+        CREATE UNIQUE INDEX IF NOT EXISTS "{PRODUCT_KEY_INDEX}"
+        ON "{P.TABLE_NAME.value}" ("{P.ID.value}", "{P.PURCHASE_START_TIME.value}");
+
+        ALTER TABLE "{P.TABLE_NAME.value}"
+        DROP CONSTRAINT IF EXISTS "{P.TABLE_NAME.value}_{P.PRODUCT_INFO_BLOCK.value}_key";
+        """,
+    ),
+    (
+        # 將 products 轉為以 purchase_end_time 按月分割的資料表
+        "003_partition_products_by_month",
+        f"""
+        ALTER TABLE "{P.TABLE_NAME.value}" RENAME TO "{LEGACY_TABLE}";
+        ALTER INDEX IF EXISTS "{PRODUCT_KEY_INDEX}" RENAME TO "{LEGACY_TABLE}_key";
+
+        CREATE TABLE "{P.TABLE_NAME.value}" (LIKE "{LEGACY_TABLE}" INCLUDING DEFAULTS)
+        PARTITION BY RANGE ("{P.PURCHASE_END_TIME.value}");
+
+        -- 分割表的唯一索引必須包含分割鍵
+        CREATE UNIQUE INDEX "{PRODUCT_KEY_INDEX}"
+        ON "{P.TABLE_NAME.value}" ("{P.ID.value}", "{P.PURCHASE_START_TIME.value}", "{P.PURCHASE_END_TIME.value}");
+        CREATE INDEX "{P.TABLE_NAME.value}_end_time_idx"
+        ON "{P.TABLE_NAME.value}" ("{P.PURCHASE_END_TIME.value}");
+        CREATE INDEX "{P.TABLE_NAME.value}_category_end_time_idx"
+        ON "{P.TABLE_NAME.value}" ("{P.CATEGORY.value}", "{P.PURCHASE_END_TIME.value}");
+
+        -- 沒有對應月份 (或結束時間為空) 的資料先進入預設分割表
+        CREATE TABLE "{P.TABLE_NAME.value}_default" PARTITION OF "{P.TABLE_NAME.value}" DEFAULT;
+
+        -- 建立涵蓋舊資料到未來三個月的每月分割表
+        DO $$
+        DECLARE
+            month_start DATE;
+            last_month DATE;
+        BEGIN
+            SELECT date_trunc('month', COALESCE(MIN("{P.PURCHASE_END_TIME.value}"), NOW()))::DATE
+            INTO month_start FROM "{LEGACY_TABLE}";
+            last_month := (date_trunc('month', NOW()) + INTERVAL '3 months')::DATE;
+
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                    '{P.TABLE_NAME.value}_p' || to_char(month_start, 'YYYY_MM'),
+                    '{P.TABLE_NAME.value}',
+                    month_start,
+                    (month_start + INTERVAL '1 month')::DATE
+                );
+                month_start := (month_start + INTERVAL '1 month')::DATE;
+            END LOOP;
+        END $$;
+
+        INSERT INTO "{P.TABLE_NAME.value}" SELECT * FROM "{LEGACY_TABLE}";
+        DROP TABLE "{LEGACY_TABLE}";
+        """,
+    ),
+    (
+        # 每個商品的價格統計，由寫入商品的同一個語句持續更新
+        "004_product_price_stats",
+        f"""
+        CREATE TABLE IF NOT EXISTS "{S.TABLE_NAME.value}" (
+            "{S.I_CODE.value}" INTEGER PRIMARY KEY,
+            "{S.MIN_PRICE.value}" INTEGER NOT NULL,
+            "{S.MAX_PRICE.value}" INTEGER NOT NULL,
+            "{S.LAST_PRICE.value}" INTEGER NOT NULL,
+            "{S.TIMES_SEEN.value}" INTEGER NOT NULL DEFAULT 1,
+            "{S.FIRST_SEEN.value}" TIMESTAMPTZ,
+            "{S.LAST_SEEN.value}" TIMESTAMPTZ
+        );
+
+        -- 以既有的搶購紀錄回填 (不指定衝突目標，已是 (site, i_code) 主鍵的資料表也適用)
+        INSERT INTO "{S.TABLE_NAME.value}" (
+            "{S.I_CODE.value}", "{S.MIN_PRICE.value}", "{S.MAX_PRICE.value}", "{S.LAST_PRICE.value}",
+            "{S.TIMES_SEEN.value}", "{S.FIRST_SEEN.value}", "{S.LAST_SEEN.value}")
+        SELECT
+            "{P.ID.value}",
+            MIN("{P.PRICE.value}"),
+            MAX("{P.PRICE.value}"),
+            (ARRAY_AGG("{P.PRICE.value}" ORDER BY "{P.PURCHASE_END_TIME.value}" DESC NULLS LAST))[1],
+            COUNT(*),
+            MIN("{P.LAST_UPDATED.value}"),
+            MAX("{P.LAST_UPDATED.value}")
+        FROM "{P.TABLE_NAME.value}"
+        WHERE "{P.PRICE.value}" IS NOT NULL
+        GROUP BY "{P.ID.value}"
+        ON CONFLICT DO NOTHING;
+        """,
+    ),
+    (
+        # 記錄商品的變動時間與各通知管道的發送進度，讓通知只發送變動的部分
+        "005_delivery_watermarks",
+        f"""
+        ALTER TABLE "{P.TABLE_NAME.value}"
+            ADD COLUMN IF NOT EXISTS "{P.FIRST_SEEN.value}" TIMESTAMPTZ,
+            ADD COLUMN IF NOT EXISTS "{P.PREVIOUS_PRICE.value}" INTEGER,
+            ADD COLUMN IF NOT EXISTS "{P.PRICE_CHANGED_AT.value}" TIMESTAMPTZ,
+            ADD COLUMN IF NOT EXISTS "{P.SOLD_OUT_AT.value}" TIMESTAMPTZ;
+
+        UPDATE "{P.TABLE_NAME.value}"
+        SET "{P.FIRST_SEEN.value}" = "{P.LAST_UPDATED.value}"
+        WHERE "{P.FIRST_SEEN.value}" IS NULL;
+
+        CREATE TABLE IF NOT EXISTS "{D.TABLE_NAME.value}" (
+            "{D.CHANNEL.value}" VARCHAR(20) NOT NULL,
+            "{D.SUBSCRIBER.value}" TEXT NOT NULL,
+            "{D.DELIVERED_AT.value}" TIMESTAMPTZ NOT NULL,
+            PRIMARY KEY ("{D.CHANNEL.value}", "{D.SUBSCRIBER.value}")
+        );
+        """,
+    ),
+    (
+        # 支援多個購物網站: 商品以 (site, i_code) 識別，且各網站的商品編號不一定是數字
+        "006_multi_site_products",
+        f"""
+        ALTER TABLE "{P.TABLE_NAME.value}"
+            ADD COLUMN IF NOT EXISTS "{P.SITE.value}" VARCHAR(20) NOT NULL DEFAULT '{Site.MOMO.value}',
+            ALTER COLUMN "{P.ID.value}" TYPE TEXT;
+
+        DROP INDEX IF EXISTS "{PRODUCT_KEY_INDEX}";
+        CREATE UNIQUE INDEX "{PRODUCT_KEY_INDEX}"
+        ON "{P.TABLE_NAME.value}" (
+            "{P.SITE.value}", "{P.ID.value}", "{P.PURCHASE_START_TIME.value}", "{P.PURCHASE_END_TIME.value}");
+
+        ALTER TABLE "{S.TABLE_NAME.value}"
+            ADD COLUMN IF NOT EXISTS "{S.SITE.value}" VARCHAR(20) NOT NULL DEFAULT '{Site.MOMO.value}',
+            ALTER COLUMN "{S.I_CODE.value}" TYPE TEXT,
+            DROP CONSTRAINT IF EXISTS "{S.TABLE_NAME.value}_pkey",
+            ADD PRIMARY KEY ("{S.SITE.value}", "{S.I_CODE.value}");
+        """,
+    ),
+    (
+        # 通知 outbox: 與商品異動在同一個交易中寫入，由發送 worker 取出發送
+        "007_notification_outbox",
+        f"""
+        CREATE TABLE IF NOT EXISTS "{O.TABLE_NAME.value}" (
+            "{O.ID.value}" BIGSERIAL PRIMARY KEY,
+            "{O.CHANNEL.value}" VARCHAR(20) NOT NULL,
+            "{O.RECIPIENT.value}" TEXT NOT NULL,
+            "{O.IDEMPOTENCY_KEY.value}" TEXT NOT NULL UNIQUE,
+            "{O.PAYLOAD.value}" JSONB NOT NULL,
+            "{O.STATUS.value}" VARCHAR(10) NOT NULL DEFAULT '{OutboxStatus.PENDING.value}',
+            "{O.ATTEMPTS.value}" INTEGER NOT NULL DEFAULT 0,
+            "{O.NEXT_ATTEMPT_AT.value}" TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            "{O.CLAIMED_AT.value}" TIMESTAMPTZ,
+            "{O.LAST_ERROR.value}" TEXT,
+            "{O.CREATED_AT.value}" TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            "{O.SENT_AT.value}" TIMESTAMPTZ
+        );
+
+        -- worker 只掃描尚未送出的訊息
+        CREATE INDEX IF NOT EXISTS "{O.TABLE_NAME.value}_due_idx"
+        ON "{O.TABLE_NAME.value}" ("{O.NEXT_ATTEMPT_AT.value}")
+        WHERE "{O.STATUS.value}" IN ('{OutboxStatus.PENDING.value}', '{OutboxStatus.SENDING.value}');
+        """,
+    ),
+]
+
+
+def get_applied_migrations(cursor):
+    """
+    Return the names of migrations that were already applied.
+    """
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{MIGRATIONS_TABLE}" (
+            name TEXT PRIMARY KEY,
+            applied_at TIMESTAMPTZ
+        );
+    """)
+    cursor.execute(f'SELECT name FROM "{MIGRATIONS_TABLE}";')
+    return {row[0] for row in cursor.fetchall()}
+
+
+def run_migrations():
+    """
+    Apply every pending migration. Returns the names of the applied ones.
+    """
+    conn = get_connection()
+    if conn is None:
+        print("Database connection failed.")
+        return []
+
+    applied = []
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                done = get_applied_migrations(cursor)
+
+        for name, sql in MIGRATIONS:
+            if name in done:
+                continue
+            with conn:
+                with conn.cursor() as cursor:
+                    print(f"套用 migration: {name}")
+                    cursor.execute(sql)
+                    cursor.execute(
+                        f'INSERT INTO "{MIGRATIONS_TABLE}" (name, applied_at) VALUES (%s, %s);',
+                        (name, datetime.now()),
+                    )
+            applied.append(name)
+    except Exception as e:
+        print(f"Migration failed: {e}")
+    finally:
+        release_connection(conn)
+
+    return applied
+
+
+if __name__ == "__main__":
+    run_migrations()
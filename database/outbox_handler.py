@@ -0,0 +1,179 @@
+"""
+This module handles the notification outbox. Messages are enqueued with an
+idempotency key inside the transaction that produced them, and the delivery
+worker claims them in batches, marks them sent or schedules a retry.
+"""
+
+import json
+from database.database_handler import execute_query
+from database.product_record import ProductRecord
+from config.constants import OutboxTable, OutboxStatus
+
+O = OutboxTable
+PENDING = OutboxStatus.PENDING.value
+SENDING = OutboxStatus.SENDING.value
+SENT = OutboxStatus.SENT.value
+DEAD = OutboxStatus.DEAD.value
+
+# 訊息中保存的商品欄位 (格式化訊息所需)
+PAYLOAD_FIELDS = ("id", "site", "brand", "product_name", "image_url", "price", "previous_price", "is_lowest_price", "change_type")
+
+
+def products_to_payload(products):
+    """
+    Serialize ProductRecord objects into JSON-friendly dicts.
+    """
+    items = []
+    for product in products:
+        item = {}
+        for name in PAYLOAD_FIELDS:
+            value = getattr(product, name)
+            if value is not None:
+                item[name] = value if isinstance(value, (str, int, float, bool)) else str(value)
+        items.append(item)
+    return items
+
+
+def products_from_payload(items):
+    """
+    Rebuild ProductRecord objects from products_to_payload output.
+    """
+    return [ProductRecord(**item) for item in items]
+
+
+def enqueue_notification(cursor, channel, recipient, idempotency_key, payload):
+    """
+    Add a message to the outbox using the caller's transaction cursor.
+    A message whose idempotency key was already enqueued is ignored.
+    Returns True if the message was added.
+    """
+    cursor.execute(f"""
+        INSERT INTO "{O.TABLE_NAME.value}" (
+            "{O.CHANNEL.value}", "{O.RECIPIENT.value}", "{O.IDEMPOTENCY_KEY.value}", "{O.PAYLOAD.value}")
+        VALUES (%s, %s, %s, %s::jsonb)
+        ON CONFLICT ("{O.IDEMPOTENCY_KEY.value}") DO NOTHING;
+    """, (channel, str(recipient), idempotency_key, json.dumps(payload, ensure_ascii=False)))
+    return cursor.rowcount == 1
+
+
+def claim_batch(limit, stale_after_seconds):
+    """
+    Claim up to `limit` due messages for delivery.
+
+    Messages stuck in "sending" longer than stale_after_seconds (a worker
+    stopped mid-batch) are claimed again. SKIP LOCKED lets several workers
+    drain the outbox without taking the same messages.
+    """
+    query = f"""
+        UPDATE "{O.TABLE_NAME.value}"
+        SET "{O.STATUS.value}" = '{SENDING}', "{O.CLAIMED_AT.value}" = NOW()
+        WHERE "{O.ID.value}" IN (
+            SELECT "{O.ID.value}" FROM "{O.TABLE_NAME.value}"
+            WHERE ("{O.STATUS.value}" = '{PENDING}' AND "{O.NEXT_ATTEMPT_AT.value}" <= NOW())
+            OR ("{O.STATUS.value}" = '{SENDING}' AND "{O.CLAIMED_AT.value}" < NOW() - make_interval(secs => %s))
+            ORDER BY "{O.ID.value}"
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING "{O.ID.value}", "{O.CHANNEL.value}", "{O.RECIPIENT.value}", "{O.PAYLOAD.value}",
+            "{O.ATTEMPTS.value}", "{O.CREATED_AT.value}";
+    """
+    results = execute_query(query, (stale_after_seconds, limit), fetch_all=True) or []
+
+    messages = []
+    for row in results:
+        messages.append({
+            "id": row[0],
+            "channel": row[1],
+            "recipient": row[2],
+            "payload": row[3],
+            "attempts": row[4],
+            "created_at": row[5],
+        })
+
+    return messages
+
+
+def mark_sent(message_id):
+    """
+    Mark a message as delivered.
+    """
+    query = f"""
+        UPDATE "{O.TABLE_NAME.value}"
+        SET "{O.STATUS.value}" = '{SENT}', "{O.SENT_AT.value}" = NOW(), "{O.LAST_ERROR.value}" = NULL
+        WHERE "{O.ID.value}" = %s;
+    """
+    execute_query(query, (message_id,))
+
+
+def mark_failed(message_id, error, retry_in_seconds, give_up):
+    """
+    Record a failed attempt: schedule a retry, or give up on the message.
+    """
+    query = f"""
+        UPDATE "{O.TABLE_NAME.value}"
+        SET "{O.STATUS.value}" = %s,
+            "{O.ATTEMPTS.value}" = "{O.ATTEMPTS.value}" + 1,
+            "{O.NEXT_ATTEMPT_AT.value}" = NOW() + make_interval(secs => %s),
+            "{O.CLAIMED_AT.value}" = NULL,
+            "{O.LAST_ERROR.value}" = %s
+        WHERE "{O.ID.value}" = %s;
+    """
+    execute_query(query, (DEAD if give_up else PENDING, retry_in_seconds, str(error)[:1000], message_id))
+
+
+def get_outbox_stats(latency_window_minutes=60):
+    """
+    Queue depth and delivery latency per channel.
+
+    Returns {channel: {"queued", "dead", "oldest_queued_seconds",
+    "latency_p50_seconds", "latency_p95_seconds", "sent_recently"}}, the
+    latency being the time from enqueue to delivery over the window.
+    """
+    query = f"""
+        SELECT
+            "{O.CHANNEL.value}",
+            COUNT(*) FILTER (WHERE "{O.STATUS.value}" IN ('{PENDING}', '{SENDING}')),
+            COUNT(*) FILTER (WHERE "{O.STATUS.value}" = '{DEAD}'),
+            EXTRACT(EPOCH FROM NOW() - MIN("{O.CREATED_AT.value}")
+                FILTER (WHERE "{O.STATUS.value}" IN ('{PENDING}', '{SENDING}'))),
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM "{O.SENT_AT.value}" - "{O.CREATED_AT.value}"))
+                FILTER (WHERE "{O.SENT_AT.value}" >= NOW() - make_interval(mins => %(window)s)),
+            percentile_cont(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM "{O.SENT_AT.value}" - "{O.CREATED_AT.value}"))
+                FILTER (WHERE "{O.SENT_AT.value}" >= NOW() - make_interval(mins => %(window)s)),
+            COUNT(*) FILTER (WHERE "{O.SENT_AT.value}" >= NOW() - make_interval(mins => %(window)s))
+        FROM "{O.TABLE_NAME.value}"
+        GROUP BY "{O.CHANNEL.value}"
+        ORDER BY "{O.CHANNEL.value}";
+    """
+    results = execute_query(query, {"window": latency_window_minutes}, fetch_all=True) or []
+
+    stats = {}
+    for row in results:
+        stats[row[0]] = {
+            "queued": row[1],
+            "dead": row[2],
+            "oldest_queued_seconds": float(row[3]) if row[3] is not None else None,
+            "latency_p50_seconds": row[4],
+            "latency_p95_seconds": row[5],
+            "sent_recently": row[6],
+        }
+
+    return stats
+
+
+def purge_sent_notifications(retention_days=7):
+    """
+    Delete delivered messages older than retention_days. Returns the number deleted.
+    """
+    query = f"""
+        WITH deleted AS (
+            DELETE FROM "{O.TABLE_NAME.value}"
+            WHERE "{O.STATUS.value}" = '{SENT}' AND "{O.SENT_AT.value}" < NOW() - make_interval(days => %s)
+            RETURNING 1
+        )
+        SELECT COUNT(*) FROM deleted;
+    """
+    result = execute_query(query, (retention_days,), fetch=True)
+
+    return result[0] if result else 0
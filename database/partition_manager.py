@@ -0,0 +1,206 @@
+"""
+This module maintains the monthly partitions of the products table, which is
+partitioned by RANGE (purchase_end_time): it creates partitions ahead of time
+and applies the retention policy by archiving and detaching old partitions.
+"""
+
+import re
+from datetime import date
+from database.database_handler import execute_query
+from database.db_connection import get_connection, release_connection
+from config.config import get_env_var
+from config.constants import ProductTable, PartitionConfig
+
+DEFAULT_MONTHS_AHEAD = 3
+DEFAULT_RETENTION_MONTHS = 24
+DEFAULT_PARTITION = f"{ProductTable.TABLE_NAME.value}_default"
+PARTITION_NAME_PATTERN = re.compile(rf"^{ProductTable.TABLE_NAME.value}_p(\d{{4}})_(\d{{2}})$")
+
+
+def add_months(month_start, months):
+    """
+    Return the first day of the month `months` after month_start.
+    """
+    month_index = month_start.year * 12 + month_start.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month_start):
+    """
+    Name of the partition holding the month that starts at month_start.
+    """
+    return f"{ProductTable.TABLE_NAME.value}_p{month_start.year:04d}_{month_start.month:02d}"
+
+
+def list_partitions():
+    """
+    Return {month_start: partition_name} for the monthly partitions.
+    """
+    query = """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class AS parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s;
+    """
+    results = execute_query(query, (ProductTable.TABLE_NAME.value,), fetch_all=True) or []
+
+    partitions = {}
+    for row in results:
+        match = PARTITION_NAME_PATTERN.match(row[0])
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = row[0]
+
+    return partitions
+
+
+def create_partition(month_start):
+    """
+    Create the partition of one month.
+
+    Rows that already landed in the default partition for that month are
+    moved into the new partition before it is attached, so attaching never
+    fails and no data is lost. Returns True on success.
+    """
+    name = partition_name(month_start)
+    month_end = add_months(month_start, 1)
+    end_column = ProductTable.PURCHASE_END_TIME.value
+    table = ProductTable.TABLE_NAME.value
+
+    query = f"""
+        CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS);
+
+        WITH moved AS (
+            DELETE FROM "{DEFAULT_PARTITION}"
+            WHERE "{end_column}" >= %(start)s AND "{end_column}" < %(end)s
+            RETURNING *
+        )
+        INSERT INTO "{name}" SELECT * FROM moved;
+
+        ALTER TABLE "{table}" ATTACH PARTITION "{name}"
+        FOR VALUES FROM (%(start)s) TO (%(end)s);
+    """
+    conn = get_connection()
+    if conn is None:
+        print("Database connection failed.")
+        return False
+
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, {"start": month_start, "end": month_end})
+        print(f"建立分割表: {name}")
+        return True
+    except Exception as e:
+        print(f"Error creating partition {name}: {e}")
+        return False
+    finally:
+        release_connection(conn)
+
+
+def ensure_future_partitions(months_ahead=None):
+    """
+    Make sure partitions exist from the current month up to `months_ahead` months ahead.
+    Returns the names of the partitions that were created.
+    """
+    if months_ahead is None:
+        months_ahead = int(get_env_var(PartitionConfig.PARTITION_MONTHS_AHEAD.value, DEFAULT_MONTHS_AHEAD))
+
+    existing = list_partitions()
+    current_month = date.today().replace(day=1)
+    created = []
+    for offset in range(months_ahead + 1):
+        month_start = add_months(current_month, offset)
+        if month_start not in existing and create_partition(month_start):
+            created.append(partition_name(month_start))
+
+    return created
+
+
+def count_partition_rows(name):
+    """
+    Number of rows in one partition.
+    """
+    result = execute_query(f'SELECT COUNT(*) FROM "{name}";', fetch=True)
+    return result[0] if result else None
+
+
+def apply_retention(retention_months=None, archive_dir=None):
+    """
+    Take partitions older than `retention_months` out of the products table.
+
+    When archive_dir is set, each partition is first exported as compressed
+    CSV through the streaming exporter and dropped only if every row was
+    archived. Without archive_dir a partition is only detached: its table is
+    kept (outside the products table) and can be archived or dropped by hand.
+
+    Returns (detached, dropped) partition names.
+    """
+    # 避免排程程式在啟動時就載入匯出模組
+    from export.product_export import export_products
+
+    if retention_months is None:
+        retention_months = int(get_env_var(PartitionConfig.PARTITION_RETENTION_MONTHS.value, DEFAULT_RETENTION_MONTHS))
+    if archive_dir is None:
+        archive_dir = get_env_var(PartitionConfig.PARTITION_ARCHIVE_DIR.value)
+
+    cutoff = add_months(date.today().replace(day=1), -retention_months)
+    detached = []
+    dropped = []
+
+    for month_start, name in sorted(list_partitions().items()):
+        if add_months(month_start, 1) > cutoff:
+            continue
+
+        if not archive_dir:
+            # 沒有封存目錄時只卸離，不刪除資料
+            if detach_partition(name, drop=False):
+                detached.append(name)
+            continue
+
+        expected = count_partition_rows(name)
+        last_day = date.fromordinal(add_months(month_start, 1).toordinal() - 1)
+        archived = export_products(archive_dir, export_format="csv", start_date=month_start, end_date=last_day)
+        if expected is None or archived != expected:
+            print(f"Archive of {name} incomplete ({archived}/{expected}), keeping partition.")
+            continue
+
+        if detach_partition(name, drop=True):
+            dropped.append(name)
+
+    return detached, dropped
+
+
+def detach_partition(name, drop=False):
+    """
+    Detach a partition from the products table, and drop it if `drop` is set.
+    Returns True on success.
+    """
+    conn = get_connection()
+    if conn is None:
+        print("Database connection failed.")
+        return False
+
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE "{ProductTable.TABLE_NAME.value}" DETACH PARTITION "{name}";')
+                if drop:
+                    cursor.execute(f'DROP TABLE "{name}";')
+        print(f"{'移除' if drop else '卸離'}過期分割表: {name}")
+        return True
+    except Exception as e:
+        print(f"Error detaching partition {name}: {e}")
+        return False
+    finally:
+        release_connection(conn)
+
+
+def run_partition_maintenance():
+    """
+    Create upcoming partitions and apply the retention policy.
+    """
+    created = ensure_future_partitions()
+    detached, dropped = apply_retention()
+    print(f"分割表維護完成: 新增 {len(created)} 個, 封存後移除 {len(dropped)} 個, 卸離 {len(detached)} 個")
+    return created, detached, dropped
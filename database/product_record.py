@@ -0,0 +1,44 @@
+"""
+This module defines ProductRecord, the single product type shared by the
+scraper, the database layer, the message formatters and the bot.
+"""
+
+from config.constants import ProductTable
+
+# 與資料表欄位同名的屬性
+COLUMN_FIELDS = tuple(column.value for column in ProductTable if column is not ProductTable.TABLE_NAME)
+
+
+class ProductRecord:
+    """
+    Compact product record.
+
+    Attributes are named after the products table columns; attributes for
+    columns that were not selected are None. `categories` holds the list of
+    categories scraped from the product page before it is stored,
+    `is_lowest_price` is set when the record was read together with its
+    price statistics and `change_type` when it was read as part of a digest.
+    """
+
+    __slots__ = COLUMN_FIELDS + ("categories", "is_lowest_price", "change_type")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+        if fields:
+            raise TypeError(f"Unknown product fields: {', '.join(fields)}")
+
+    @classmethod
+    def from_row(cls, columns, row):
+        """
+        Build a record from a result row and the names of its selected columns.
+        """
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(record, name, None)
+        for name, value in zip(columns, row):
+            setattr(record, name, value)
+        return record
+
+    def __repr__(self):
+        return f"ProductRecord(id={self.id!r}, brand={self.brand!r}, product_name={self.product_name!r}, price={self.price!r})"
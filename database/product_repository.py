@@ -0,0 +1,150 @@
+"""
+This module is the single read path for products. Callers ask for the columns
+they need and get ProductRecord objects back, so no query selects, converts or
+formats columns that its caller never uses.
+"""
+
+from database.database_handler import execute_query
+from database.product_record import ProductRecord
+from config.constants import ProductTable, PriceStatsTable, ChangeType
+
+# 訊息格式化 (Telegram / Email) 需要的欄位
+CARD_COLUMNS = (
+    ProductTable.ID,
+    ProductTable.PRODUCT_NAME,
+    ProductTable.BRAND,
+    ProductTable.IMAGE_URL,
+    ProductTable.PRICE,
+    ProductTable.SITE,
+)
+
+# 重新爬取類別只需要商品的鍵值 (site, i_code, purchase_start_time) 與分割鍵
+ENRICH_COLUMNS = (
+    ProductTable.SITE,
+    ProductTable.ID,
+    ProductTable.PURCHASE_START_TIME,
+    ProductTable.PURCHASE_END_TIME,
+)
+
+# 同一商品在不同網站的編號可能相同
+PRODUCT_KEY = (ProductTable.SITE, ProductTable.ID)
+
+# 摘要需要的欄位 (另含降價前的價格)
+DIGEST_COLUMNS = CARD_COLUMNS + (ProductTable.PREVIOUS_PRICE,)
+
+# 以範圍條件取代 DATE(...) = CURRENT_DATE，讓查詢只掃描當月的分割表
+TODAY_CONDITION = (
+    f'"{ProductTable.PURCHASE_END_TIME.value}" >= CURRENT_DATE '
+    f'AND "{ProductTable.PURCHASE_END_TIME.value}" < CURRENT_DATE + 1'
+)
+
+# 目前價格不高於歷史最低價，且不是第一次上架
+LOWEST_PRICE_EXPRESSION = (
+    f'COALESCE("{ProductTable.PRICE.value}" <= stats."{PriceStatsTable.MIN_PRICE.value}" '
+    f'AND stats."{PriceStatsTable.TIMES_SEEN.value}" > 1, FALSE) AS is_lowest_price'
+)
+
+# 商品進入「今日」清單的時間: 第一次爬到的時間，或結束當天的 00:00
+# (價格統計表也有 first_seen 欄位，因此加上資料表名稱)
+VISIBLE_SINCE = (
+    f'GREATEST("{ProductTable.TABLE_NAME.value}"."{ProductTable.FIRST_SEEN.value}", '
+    f'"{ProductTable.TABLE_NAME.value}"."{ProductTable.PURCHASE_END_TIME.value}"::date)'
+)
+
+# 自上次發送後的變動類型；新上架優先於售完與降價
+CHANGE_TYPE_EXPRESSION = f"""CASE
+            WHEN %(since)s::timestamptz IS NULL OR {VISIBLE_SINCE} > %(since)s THEN '{ChangeType.NEW.value}'
+            WHEN "{ProductTable.SOLD_OUT_AT.value}" > %(since)s THEN '{ChangeType.SOLD_OUT.value}'
+            WHEN "{ProductTable.PRICE_CHANGED_AT.value}" > %(since)s
+                AND "{ProductTable.PRICE.value}" < "{ProductTable.PREVIOUS_PRICE.value}" THEN '{ChangeType.PRICE_DROP.value}'
+        END"""
+
+
+def fetch_products(columns, condition=None, params=None, distinct_on=None, with_price_stats=False, extra_columns=()):
+    """
+    Fetches products as ProductRecord objects, selecting only `columns`.
+
+    :param columns: ProductTable members to select.
+    :param condition: Optional SQL WHERE condition.
+    :param params: Parameters for the condition.
+    :param distinct_on: Optional ProductTable members for SELECT DISTINCT ON.
+    :param with_price_stats: Also compute is_lowest_price from the price statistics.
+    :param extra_columns: (SQL expression, attribute name) pairs to select as well.
+    """
+    names = tuple(column.value for column in columns)
+    column_list = ", ".join(f'"{ProductTable.TABLE_NAME.value}"."{name}"' for name in names)
+    distinct_clause = ""
+    if distinct_on:
+        distinct_list = ", ".join(f'"{ProductTable.TABLE_NAME.value}"."{column.value}"' for column in distinct_on)
+        distinct_clause = f"DISTINCT ON ({distinct_list}) "
+    where_clause = f"WHERE {condition}" if condition else ""
+    join_clause = ""
+
+    for expression, name in extra_columns:
+        names += (name,)
+        column_list += f", {expression} AS {name}"
+
+    if with_price_stats:
+        names += ("is_lowest_price",)
+        column_list += f", {LOWEST_PRICE_EXPRESSION}"
+        join_clause = (
+            f'LEFT JOIN "{PriceStatsTable.TABLE_NAME.value}" AS stats '
+            f'ON stats."{PriceStatsTable.SITE.value}" = "{ProductTable.TABLE_NAME.value}"."{ProductTable.SITE.value}" '
+            f'AND stats."{PriceStatsTable.I_CODE.value}" = "{ProductTable.TABLE_NAME.value}"."{ProductTable.ID.value}"'
+        )
+
+    query = f"""
+        SELECT {distinct_clause}{column_list}
+        FROM "{ProductTable.TABLE_NAME.value}"
+        {join_clause}
+        {where_clause};
+    """
+    results = execute_query(query, params, fetch_all=True) or []
+
+    from_row = ProductRecord.from_row
+    return [from_row(names, row) for row in results]
+
+
+def get_all_products_today(columns=CARD_COLUMNS):
+    """
+    Fetches all products whose purchase end time is today, flagged when
+    their price is the lowest ever seen.
+    """
+    return fetch_products(columns, TODAY_CONDITION, distinct_on=PRODUCT_KEY, with_price_stats=True)
+
+
+def get_products_with_empty_category(columns=ENRICH_COLUMNS, site=None):
+    """
+    Fetches products that have empty categories, optionally of a single site.
+    """
+    condition = f""""{ProductTable.CATEGORY.value}" = ''"""
+    if site is None:
+        return fetch_products(columns, condition)
+    return fetch_products(columns, f'{condition} AND "{ProductTable.SITE.value}" = %s', (site,))
+
+
+def get_products_by_category(category, columns=CARD_COLUMNS):
+    """
+    Fetches today's products in a specific category.
+    """
+    condition = f'"{ProductTable.CATEGORY.value}" = %s AND {TODAY_CONDITION}'
+    return fetch_products(columns, condition, (category,), with_price_stats=True)
+
+
+def get_product_changes_since(since, columns=DIGEST_COLUMNS):
+    """
+    Fetches today's products that changed since the last delivery: products
+    that appeared, dropped in price or sold out after `since`. The changes
+    are computed in a single query; each record carries its change_type.
+
+    :param since: Time of the last delivery, or None to get every product as new.
+    """
+    condition = f"""{TODAY_CONDITION} AND ({CHANGE_TYPE_EXPRESSION}) IS NOT NULL"""
+    return fetch_products(
+        columns,
+        condition,
+        {"since": since},
+        distinct_on=PRODUCT_KEY,
+        with_price_stats=True,
+        extra_columns=((CHANGE_TYPE_EXPRESSION, "change_type"),),
+    )
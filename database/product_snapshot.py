@@ -0,0 +1,88 @@
+"""
+This module provides the per-run snapshot of the stored products of a site
+listing: their last known price, countdown and category, loaded with one
+query. The scraper uses it to tell new products from existing ones and to
+skip writing products whose values did not change.
+"""
+
+from database.database_handler import execute_query, parse_price, parse_countdown
+from config.constants import ProductTable
+
+
+def product_key(product_info):
+    """
+    The (i_code, purchase_start_time, purchase_end_time) key of a product in a site.
+    """
+    return (str(product_info.id), product_info.purchase_start_time, product_info.purchase_end_time)
+
+
+class ProductSnapshot:
+    """
+    Last stored (price, countdown, category) of products, by product key.
+    """
+
+    def __init__(self, rows=None):
+        self._rows = rows or {}
+
+    @classmethod
+    def load(cls, site, products):
+        """
+        Load the stored state of the listed products of a site.
+
+        The lookup is limited to the listed i_codes and, through the partition
+        key, to sales ending no earlier than the earliest listed one.
+        """
+        products = [product for product in products if product.purchase_end_time is not None]
+        if not products:
+            return cls()
+
+        # 以 timestamp (工作階段時區) 取回時間，與爬到的 naive datetime 比對
+        query = f"""
+            SELECT "{ProductTable.ID.value}", "{ProductTable.PURCHASE_START_TIME.value}"::timestamp,
+                "{ProductTable.PURCHASE_END_TIME.value}"::timestamp,
+                "{ProductTable.PRICE.value}", "{ProductTable.COUNTDOWN.value}", "{ProductTable.CATEGORY.value}"
+            FROM "{ProductTable.TABLE_NAME.value}"
+            WHERE "{ProductTable.SITE.value}" = %s AND "{ProductTable.ID.value}" = ANY(%s)
+            AND "{ProductTable.PURCHASE_END_TIME.value}" >= %s;
+        """
+        params = (
+            site,
+            sorted({str(product.id) for product in products}),
+            min(product.purchase_end_time for product in products),
+        )
+        results = execute_query(query, params, fetch_all=True)
+        if results is None:
+            raise RuntimeError(f"Failed to load the product snapshot of {site}.")
+
+        return cls({(row[0], row[1], row[2]): (row[3], row[4], row[5]) for row in results})
+
+    def __len__(self):
+        return len(self._rows)
+
+    def contains(self, product_info):
+        """
+        Whether the product is already stored.
+        """
+        return product_key(product_info) in self._rows
+
+    def is_dirty(self, product_info):
+        """
+        Whether writing the product would change its stored price, countdown
+        or category. Values are compared as they would be stored: fields
+        that are None or unparseable (e.g. "countdown not found") are not
+        written and never dirty.
+        """
+        stored = self._rows.get(product_key(product_info))
+        if stored is None:
+            return True
+        price, countdown, category = stored
+
+        scraped_price = parse_price(product_info.price)
+        scraped_countdown = parse_countdown(product_info.countdown)
+        if scraped_price is not None and (price is None or scraped_price != float(price)):
+            return True
+        if scraped_countdown is not None and scraped_countdown != countdown:
+            return True
+        if product_info.categories and ", ".join(product_info.categories) != category:
+            return True
+        return False
@@ -0,0 +1,61 @@
+"""
+This module provides a small TTL cache for read-only product queries used by
+the bot, so bursts of users do not re-run the same query. The cache is
+invalidated as soon as a scrape finishes when running in the unified runtime.
+
+The cache holds at most MAX_ENTRIES results; expired entries are purged on
+insert and the least recently used ones are evicted beyond the limit.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL_SECONDS = 300
+MAX_ENTRIES = 256
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def cached_query(func, *args, ttl=DEFAULT_TTL_SECONDS):
+    """
+    Return the cached result of func(*args), calling it if missing or expired.
+    """
+    key = (func.__module__, func.__name__, args)
+    now = time.monotonic()
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry[0] > now:
+            _cache.move_to_end(key)
+            return entry[1]
+
+    result = func(*args)
+
+    # 查詢失敗 (None) 時不快取
+    if result is not None:
+        with _lock:
+            _cache[key] = (now + ttl, result)
+            _cache.move_to_end(key)
+            purge_expired(now)
+            while len(_cache) > MAX_ENTRIES:
+                _cache.popitem(last=False)
+
+    return result
+
+
+def purge_expired(now):
+    """
+    Drop the expired entries; the caller holds the lock.
+    """
+    for key in [key for key, entry in _cache.items() if entry[0] <= now]:
+        del _cache[key]
+
+
+def invalidate_query_cache(**_):
+    """
+    Drop every cached query result.
+    """
+    with _lock:
+        _cache.clear()
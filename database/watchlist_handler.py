@@ -0,0 +1,86 @@
+"""
+This module handles database operations related to user watchlists,
+such as adding, removing, and querying alert rules.
+"""
+
+from datetime import datetime
+from database.database_handler import execute_query
+from config.constants import WatchlistTable
+
+
+def add_watchlist_rule(chat_id, rule_type, pattern):
+    """
+    Adds an alert rule for a Telegram chat and returns the new rule id.
+    """
+    query = f"""
+        INSERT INTO "{WatchlistTable.TABLE_NAME.value}" (
+            "{WatchlistTable.CHAT_ID.value}", "{WatchlistTable.RULE_TYPE.value}",
+            "{WatchlistTable.PATTERN.value}", "{WatchlistTable.CREATED_AT.value}")
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT ("{WatchlistTable.CHAT_ID.value}", "{WatchlistTable.RULE_TYPE.value}", "{WatchlistTable.PATTERN.value}")
+        DO UPDATE SET "{WatchlistTable.CREATED_AT.value}" = "{WatchlistTable.TABLE_NAME.value}"."{WatchlistTable.CREATED_AT.value}"
+        RETURNING "{WatchlistTable.ID.value}";
+    """
+    result = execute_query(query, (chat_id, rule_type, pattern, datetime.now()), fetch=True)
+
+    return result[0] if result else None
+
+
+def remove_watchlist_rule(chat_id, rule_id):
+    """
+    Removes one of a chat's alert rules. Returns True if a rule was deleted.
+    """
+    query = f"""
+        DELETE FROM "{WatchlistTable.TABLE_NAME.value}"
+        WHERE "{WatchlistTable.ID.value}" = %s AND "{WatchlistTable.CHAT_ID.value}" = %s
+        RETURNING "{WatchlistTable.ID.value}";
+    """
+    result = execute_query(query, (rule_id, chat_id), fetch=True)
+
+    return result is not None
+
+
+def get_watchlist_rules(chat_id):
+    """
+    Fetches all alert rules registered by a Telegram chat.
+    """
+    query = f"""
+        SELECT "{WatchlistTable.ID.value}", "{WatchlistTable.RULE_TYPE.value}", "{WatchlistTable.PATTERN.value}"
+        FROM "{WatchlistTable.TABLE_NAME.value}"
+        WHERE "{WatchlistTable.CHAT_ID.value}" = %s
+        ORDER BY "{WatchlistTable.ID.value}";
+    """
+    results = execute_query(query, (chat_id,), fetch_all=True) or []
+
+    rules = []
+    for row in results:
+        rules.append({
+            "id": row[0],
+            "rule_type": row[1],
+            "pattern": row[2],
+        })
+
+    return rules
+
+
+def get_all_watchlist_rules():
+    """
+    Fetches every registered alert rule, used to compile the matching engine.
+    """
+    query = f"""
+        SELECT "{WatchlistTable.ID.value}", "{WatchlistTable.CHAT_ID.value}",
+            "{WatchlistTable.RULE_TYPE.value}", "{WatchlistTable.PATTERN.value}"
+        FROM "{WatchlistTable.TABLE_NAME.value}";
+    """
+    results = execute_query(query, fetch_all=True) or []
+
+    rules = []
+    for row in results:
+        rules.append({
+            "id": row[0],
+            "chat_id": row[1],
+            "rule_type": row[2],
+            "pattern": row[3],
+        })
+
+    return rules
@@ -0,0 +1,328 @@
+"""
+This module exports the products table for analysis.
+
+Rows are streamed through a server-side (named) cursor in fixed-size batches
+and written to files partitioned by the date of purchase_end_time, so memory
+stays flat no matter how large the table is. Incremental exports only write
+rows whose last_updated is newer than the previous export's watermark.
+
+    python -m export.product_export --output exports/ --format parquet --incremental
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+from datetime import datetime, date
+from database.db_connection import get_connection, release_connection
+from config.constants import ProductTable
+
+DEFAULT_BATCH_SIZE = 5000
+WATERMARK_FILE = "_watermark.json"
+EXPORT_FORMATS = ("parquet", "arrow", "csv")
+
+EXPORT_COLUMNS = [
+    ProductTable.ID,
+    ProductTable.PRODUCT_INFO_BLOCK,
+    ProductTable.PRODUCT_NAME,
+    ProductTable.BRAND,
+    ProductTable.IMAGE_URL,
+    ProductTable.PRICE,
+    ProductTable.PURCHASE_START_TIME,
+    ProductTable.PURCHASE_END_TIME,
+    ProductTable.LAST_UPDATED,
+    ProductTable.COUNTDOWN,
+    ProductTable.ORIGINAL_COUNT,
+    ProductTable.CATEGORY,
+    ProductTable.SITE,
+]
+COLUMN_NAMES = [column.value for column in EXPORT_COLUMNS]
+END_TIME_INDEX = COLUMN_NAMES.index(ProductTable.PURCHASE_END_TIME.value)
+LAST_UPDATED_INDEX = COLUMN_NAMES.index(ProductTable.LAST_UPDATED.value)
+
+
+def arrow_schema():
+    """
+    Build the Arrow schema of the exported columns.
+    """
+    import pyarrow as pa
+
+    timestamp = pa.timestamp("us", tz="UTC")
+    return pa.schema([
+        (ProductTable.ID.value, pa.string()),
+        (ProductTable.PRODUCT_INFO_BLOCK.value, pa.string()),
+        (ProductTable.PRODUCT_NAME.value, pa.string()),
+        (ProductTable.BRAND.value, pa.string()),
+        (ProductTable.IMAGE_URL.value, pa.string()),
+        (ProductTable.PRICE.value, pa.int64()),
+        (ProductTable.PURCHASE_START_TIME.value, timestamp),
+        (ProductTable.PURCHASE_END_TIME.value, timestamp),
+        (ProductTable.LAST_UPDATED.value, timestamp),
+        (ProductTable.COUNTDOWN.value, pa.int64()),
+        (ProductTable.ORIGINAL_COUNT.value, pa.int64()),
+        (ProductTable.CATEGORY.value, pa.string()),
+        (ProductTable.SITE.value, pa.string()),
+    ])
+
+
+class PartitionWriter:
+    """
+    Writes batches of rows into one file per date partition.
+
+    Rows arrive ordered by purchase_end_time, so only the current
+    partition's file is open at any time.
+    """
+
+    def __init__(self, output_dir, export_format, run_id):
+        self.output_dir = output_dir
+        self.export_format = export_format
+        self.run_id = run_id
+        self.rows_written = 0
+        self.files_written = []
+        self._partition = None
+        self._writer = None
+        self._file = None
+        self._schema = arrow_schema() if export_format != "csv" else None
+
+    def write(self, partition, rows):
+        """
+        Append rows belonging to a single partition.
+        """
+        if partition != self._partition:
+            self.close()
+            self._open(partition)
+
+        if self.export_format == "csv":
+            self._writer.writerows(rows)
+        else:
+            import pyarrow as pa
+
+            columns = {name: [row[index] for row in rows] for index, name in enumerate(COLUMN_NAMES)}
+            columns[ProductTable.ID.value] = [str(value) if value is not None else None for value in columns[ProductTable.ID.value]]
+            self._writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=self._schema))
+
+        self.rows_written += len(rows)
+
+    def _open(self, partition):
+        """
+        Open the output file of a partition.
+        """
+        partition_dir = os.path.join(self.output_dir, f"date={partition}")
+        os.makedirs(partition_dir, exist_ok=True)
+
+        if self.export_format == "parquet":
+            import pyarrow.parquet as pq
+
+            path = os.path.join(partition_dir, f"part-{self.run_id}.parquet")
+            self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+        elif self.export_format == "arrow":
+            import pyarrow as pa
+
+            path = os.path.join(partition_dir, f"part-{self.run_id}.arrow")
+            self._file = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._file, self._schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+        else:
+            path = os.path.join(partition_dir, f"part-{self.run_id}.csv.gz")
+            self._file = gzip.open(path, "wt", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(COLUMN_NAMES)
+
+        self._partition = partition
+        self.files_written.append(path)
+
+    def close(self):
+        """
+        Close the currently open partition file.
+        """
+        if self._writer is not None and self.export_format != "csv":
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        self._writer = None
+        self._file = None
+        self._partition = None
+
+
+def read_watermark(output_dir):
+    """
+    Read the last_updated watermark of the previous export, if any.
+    """
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as file:
+        return datetime.fromisoformat(json.load(file)["last_updated"])
+
+
+def write_watermark(output_dir, watermark):
+    """
+    Persist the watermark after a successful export.
+    """
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump({"last_updated": watermark.isoformat()}, file)
+    os.replace(temp_path, path)
+
+
+def build_export_query(start_date=None, end_date=None, category=None, since=None):
+    """
+    Build the streaming SELECT and its parameters from the export filters.
+    """
+    conditions = []
+    params = []
+
+    if start_date:
+        conditions.append(f'"{ProductTable.PURCHASE_END_TIME.value}" >= %s')
+        params.append(start_date)
+    if end_date:
+        # 包含結束日期當天
+        conditions.append(f'"{ProductTable.PURCHASE_END_TIME.value}" < %s::date + 1')
+        params.append(end_date)
+    if category:
+        conditions.append(f'%s = ANY(string_to_array("{ProductTable.CATEGORY.value}", \', \'))')
+        params.append(category)
+    if since:
+        conditions.append(f'"{ProductTable.LAST_UPDATED.value}" > %s')
+        params.append(since)
+
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    column_list = ", ".join(f'"{name}"' for name in COLUMN_NAMES)
+
+    query = f"""
+        SELECT {column_list}
+        FROM "{ProductTable.TABLE_NAME.value}"
+        {where_clause}
+        ORDER BY "{ProductTable.PURCHASE_END_TIME.value}";
+    """
+    return query, tuple(params)
+
+
+def export_products(output_dir, export_format="parquet", start_date=None, end_date=None,
+                    category=None, incremental=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Stream products into partitioned files. Returns the number of rows written.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    if export_format != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("pyarrow is required for parquet/arrow exports. Install it or use --format csv.")
+            return 0
+
+    os.makedirs(output_dir, exist_ok=True)
+    since = read_watermark(output_dir) if incremental else None
+    query, params = build_export_query(start_date, end_date, category, since)
+
+    conn = get_connection()
+    if conn is None:
+        print("Database connection failed.")
+        return 0
+
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    writer = PartitionWriter(output_dir, export_format, run_id)
+    watermark = since
+
+    try:
+        with conn:
+            # 具名游標在伺服器端執行，每次只取回 batch_size 筆
+            with conn.cursor(name=f"product_export_{run_id}") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query, params)
+
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+
+                    partition_rows = []
+                    partition = None
+                    for row in rows:
+                        row_partition = partition_key(row[END_TIME_INDEX])
+                        if partition_rows and row_partition != partition:
+                            writer.write(partition, partition_rows)
+                            partition_rows = []
+                        partition = row_partition
+                        partition_rows.append(row)
+
+                        last_updated = row[LAST_UPDATED_INDEX]
+                        if last_updated and (watermark is None or last_updated > watermark):
+                            watermark = last_updated
+
+                    if partition_rows:
+                        writer.write(partition, partition_rows)
+    except Exception as e:
+        print(f"Export failed: {e}")
+        writer.close()
+        return 0
+    finally:
+        release_connection(conn)
+
+    writer.close()
+
+    if incremental and watermark is not None:
+        write_watermark(output_dir, watermark)
+
+    print(f"匯出完成: {writer.rows_written} 筆, {len(writer.files_written)} 個檔案")
+    return writer.rows_written
+
+
+def partition_key(value):
+    """
+    Date partition of a row, from its purchase_end_time.
+    """
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    return "unknown"
+
+
+def parse_date(value):
+    """
+    argparse type for YYYY-MM-DD dates.
+    """
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def build_parser(parser=None):
+    """
+    Build (or extend) the argument parser of the export command.
+    """
+    parser = parser or argparse.ArgumentParser(description="Export the products table.")
+    parser.add_argument("--output", required=True, help="Output directory")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="parquet")
+    parser.add_argument("--start-date", type=parse_date, help="Earliest purchase end date (YYYY-MM-DD)")
+    parser.add_argument("--end-date", type=parse_date, help="Latest purchase end date (YYYY-MM-DD)")
+    parser.add_argument("--category", help="Only export products in this category")
+    parser.add_argument("--incremental", action="store_true", help="Only export rows updated since the last export")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    return parser
+
+
+def run_export(args):
+    """
+    Run an export from parsed command-line arguments.
+    """
+    return export_products(
+        args.output,
+        export_format=args.format,
+        start_date=args.start_date,
+        end_date=args.end_date,
+        category=args.category,
+        incremental=args.incremental,
+        batch_size=args.batch_size,
+    )
+
+
+def main():
+    """
+    Command-line entry point.
+    """
+    run_export(build_parser().parse_args())
+
+
+if __name__ == "__main__":
+    main()
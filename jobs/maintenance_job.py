@@ -0,0 +1,12 @@
+"""
+This module defines a job for database maintenance.
+"""
+
+import asyncio
+from database.partition_manager import run_partition_maintenance
+
+async def partition_maintenance_job():
+    """
+    Asynchronous job to create upcoming partitions and apply the retention policy.
+    """
+    await asyncio.to_thread(run_partition_maintenance)
@@ -1,11 +1,32 @@
 """
-This module defines a job for sending notifications.
+This module defines a job for queueing notifications; the delivery worker
+(messages.delivery_worker) sends them.
 """
 
-from messages.sender import send_notifications
+import asyncio
+from messages.outbox import enqueue_notifications, notify_enqueued
+from database.outbox_handler import purge_sent_notifications
+from database.media_cache_handler import evict_expired_media, get_media_cache_stats
+from runtime.event_bus import event_bus, NOTIFY_COMPLETED
 
 async def notify_job():
     """
-    Asynchronous job to send notifications.
+    Asynchronous job to queue the notification digests.
     """    
-    await send_notifications()
+    enqueued = await asyncio.to_thread(enqueue_notifications)
+    if enqueued:
+        await notify_enqueued()
+
+    # 清除已送達的舊訊息
+    purged = await asyncio.to_thread(purge_sent_notifications)
+    print(f"訊息佇列: 排入 {enqueued} 筆商品變動, 清除 {purged} 則已送達訊息")
+
+    # 清除已結束商品的圖片快取
+    evicted = await asyncio.to_thread(evict_expired_media)
+    stats = await asyncio.to_thread(get_media_cache_stats)
+    print(
+        f"圖片快取: 清除 {evicted} 筆, 目前 {stats['entries']} 筆, "
+        f"累計命中 {stats['hits']} 次, 累計節省上傳 {stats['bytes_avoided']} bytes"
+    )
+
+    await event_bus.publish(NOTIFY_COMPLETED)
@@ -3,11 +3,56 @@ This module defines and starts job scheduling using AsyncIOScheduler
 from APScheduler. It includes jobs for scraping and sending notifications.
 """
 
+import asyncio
+import importlib
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from scraper.scraper import scrape_job
-from jobs.notify_job import notify_job
 
+# 工作以 "模組:函式" 指定，第一次執行時才載入，
+# 排程啟動時不需載入 Playwright、Telegram、SMTP 等套件
+SCRAPE_JOB = "scraper.scraper:scrape_job"
+NOTIFY_JOB = "jobs.notify_job:notify_job"
+MAINTENANCE_JOB = "jobs.maintenance_job:partition_maintenance_job"
+
+# 執行中的排程工作，關閉時用來等待工作結束
+active_jobs = set()
+
+
+def load_job(job):
+    """
+    Resolve a "module:function" job reference; coroutine functions are returned as is.
+    """
+    if isinstance(job, str):
+        module_name, _, function_name = job.partition(":")
+        return getattr(importlib.import_module(module_name), function_name)
+    return job
+
+
+async def run_tracked_job(job):
+    """
+    Run a job coroutine function (or a "module:function" reference to one)
+    and keep track of it while it is running.
+    """
+    task = asyncio.current_task()
+    active_jobs.add(task)
+    try:
+        await load_job(job)()
+    finally:
+        active_jobs.discard(task)
+
+
+async def wait_for_active_jobs(timeout=None):
+    """
+    Wait for running jobs to finish; cancel the ones still running after the timeout.
+    """
+    if not active_jobs:
+        return
+    print(f"等待 {len(active_jobs)} 個執行中的工作結束...")
+    _, pending = await asyncio.wait(set(active_jobs), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
 
 # 爬蟲執行的時間
 def get_scrape_times() -> list:
@@ -23,10 +68,22 @@ def get_scrape_times() -> list:
 # 發送訊息的時間
 def get_notify_times() -> list:
     """
-    Define the schedule for notification jobs.
+    Define the schedule for notification jobs: the daily digest at midnight,
+    then the changes after each daytime scrape. Only changes since the last
+    delivery are sent, so running more often does not repeat products.
     """    
+    notify_times = [(0, 0)]
+    for hour in range(8, 24):
+        notify_times.append((hour, 15))
+    return notify_times
+
+# 資料庫維護的時間
+def get_maintenance_times() -> list:
+    """
+    Define the schedule for database maintenance jobs, away from the scrape slots.
+    """
     return [
-        (0, 0)
+        (3, 30)
     ]
 
 # 設置爬蟲的排程
@@ -37,8 +94,9 @@ def schedule_scrape_jobs(scheduler: AsyncIOScheduler):
     scrape_times = get_scrape_times()
     for hour, minute in scrape_times:
         scheduler.add_job(
-            scrape_job,
+            run_tracked_job,
             CronTrigger(hour=hour, minute=minute),
+            args=[SCRAPE_JOB],
             misfire_grace_time=60
         )
 
@@ -50,16 +108,40 @@ def schedule_notify_jobs(scheduler: AsyncIOScheduler):
     notify_times = get_notify_times()
     for hour, minute in notify_times:
         scheduler.add_job(
-            notify_job,
+            run_tracked_job,
             CronTrigger(hour=hour, minute=minute),
+            args=[NOTIFY_JOB],
             misfire_grace_time=60
         )
 
-def start_scheduler():
+# 設置資料庫維護的排程
+def schedule_maintenance_jobs(scheduler: AsyncIOScheduler):
+    """
+    Schedule the database maintenance jobs.
+    """
+    maintenance_times = get_maintenance_times()
+    for hour, minute in maintenance_times:
+        scheduler.add_job(
+            run_tracked_job,
+            CronTrigger(hour=hour, minute=minute),
+            args=[MAINTENANCE_JOB],
+            misfire_grace_time=3600
+        )
+
+def create_scheduler() -> AsyncIOScheduler:
+    """
+    Create a scheduler with scraping and notification jobs, without starting it.
     """
-    Start the scheduler with scraping and notification jobs.
-    """    
     scheduler = AsyncIOScheduler()
     schedule_scrape_jobs(scheduler)
     schedule_notify_jobs(scheduler)
+    schedule_maintenance_jobs(scheduler)
+    return scheduler
+
+def start_scheduler() -> AsyncIOScheduler:
+    """
+    Start the scheduler with scraping and notification jobs.
+    """    
+    scheduler = create_scheduler()
     scheduler.start()
+    return scheduler
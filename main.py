@@ -1,23 +1,165 @@
 """
-Main module to start the scheduler and run the application.
+Main module: command-line entry point of the application.
+
+Each command imports only what it needs, so one-shot runs (cron) and
+container restarts do not load Playwright or python-telegram-bot unless the
+command uses them.
+
+    python main.py                   # scheduler and notification delivery worker (default)
+    python main.py scheduler
+    python main.py scrape-once       # one scrape run
+    python main.py notify-once       # queue the notification digests and deliver them
+    python main.py bot [webhook]     # Telegram bot, polling by default
+    python main.py export --output exports/ --format parquet --incremental
+    python main.py --profile-startup scrape-once   # import timing breakdown before running
 """
 
+import argparse
 import asyncio
-from jobs.schedule_job import start_scheduler
-# from scraper.scraper import scrape_job  # For testing
-# from jobs.notify_job import notify_job # For testing
+from runtime.import_profiler import ImportProfiler
 
 
-async def main():
+def load_scheduler(args):
     """
-    Main asynchronous entry point for the application.
-    Starts the scheduler and waits indefinitely.
+    The scheduler with the notification delivery worker, running indefinitely.
     """
-    start_scheduler()     # Starts the scheduler for the application
-    # await scrape_job()  # For testing: triggers the scrape job manually
-    # await notify_job()  # For testing: triggers the notify job manually
-    await asyncio.Event().wait()    # to keep the program running
+    from jobs.schedule_job import start_scheduler
+    from messages.delivery_worker import run_delivery_worker
+
+    async def run_scheduler():
+        start_scheduler()     # Starts the scheduler for the application
+        await run_delivery_worker()    # to keep the program running
+
+    return lambda: asyncio.run(run_scheduler())
+
+
+def load_scrape_once(args):
+    """
+    One scrape run of every enabled site.
+    """
+    from database.db_connection import close_pool
+    from scraper.scraper import scrape_job
+
+    def run():
+        try:
+            asyncio.run(scrape_job())
+        finally:
+            close_pool()
+
+    return run
+
+
+def load_notify_once(args):
+    """
+    Queue the notification digests, then deliver what is due unless --no-deliver.
+    """
+    from database.db_connection import close_pool
+    from jobs.notify_job import notify_job
+    from messages.delivery_worker import drain_outbox
+
+    async def notify_once():
+        await notify_job()
+        if args.deliver:
+            print(f"訊息佇列: 發送 {await drain_outbox()} 則")
+
+    def run():
+        try:
+            asyncio.run(notify_once())
+        finally:
+            close_pool()
+
+    return run
 
-if __name__ == "__main__":
-    asyncio.run(main())
 
+def load_bot(args):
+    """
+    The Telegram bot in polling or webhook mode.
+    """
+    from telegram_bot import run_bot
+
+    return lambda: run_bot(args.mode)
+
+
+def load_export(args):
+    """
+    Export the products table; the export options follow the command.
+    """
+    from export.product_export import build_parser as build_export_parser, run_export
+
+    export_parser = argparse.ArgumentParser(prog="main.py export", description="Export the products table.")
+    export_args = build_export_parser(export_parser).parse_args(args.export_args)
+
+    return lambda: run_export(export_args)
+
+
+# 指令 -> 載入函式 (在函式內才 import 該指令需要的模組)
+COMMANDS = {
+    "scheduler": load_scheduler,
+    "scrape-once": load_scrape_once,
+    "notify-once": load_notify_once,
+    "bot": load_bot,
+    "export": load_export,
+}
+
+
+def build_parser():
+    """
+    Build the argument parser of the command-line interface.
+    """
+    parser = argparse.ArgumentParser(description="Limited-time sale scraper and notifier.")
+    parser.add_argument(
+        "--profile-startup", action="store_true",
+        help="print how long the command took to load, by imported package",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("scheduler", help="run the scheduled jobs and the delivery worker (default)")
+    subparsers.add_parser("scrape-once", help="scrape every enabled site once")
+
+    notify_parser = subparsers.add_parser("notify-once", help="queue the notification digests and deliver them")
+    notify_parser.add_argument(
+        "--no-deliver", dest="deliver", action="store_false",
+        help="only queue them; a running delivery worker sends them",
+    )
+
+    bot_parser = subparsers.add_parser("bot", help="run the Telegram bot")
+    bot_parser.add_argument("mode", nargs="?", choices=("polling", "webhook"), help="default: TELEGRAM_MODE or polling")
+
+    # export 的選項由 export.product_export 解析 (見 main)
+    subparsers.add_parser("export", help="export the products table (see: main.py export -h)", add_help=False)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Parse the command line, load the selected command and run it.
+    """
+    parser = build_parser()
+    args, extra_args = parser.parse_known_args(argv)
+    command = args.command or "scheduler"
+    if extra_args and command != "export":
+        parser.error(f"unrecognized arguments: {' '.join(extra_args)}")
+    args.export_args = extra_args
+
+    profiler = ImportProfiler() if args.profile_startup else None
+    if profiler:
+        profiler.start()
+    try:
+        run = COMMANDS[command](args)
+    finally:
+        if profiler:
+            profiler.stop()
+    if profiler:
+        print(f"[{command}]")
+        for line in profiler.report():
+            print(line)
+
+    try:
+        run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Delivery worker: drains the notification outbox in batches.
+
+Messages are claimed in batches, sent with a per-channel throughput limit,
+and marked sent; a failed send is retried with exponential backoff until
+OUTBOX_MAX_ATTEMPTS, after which it is marked dead. Delivery is at least
+once: a worker stopped between a send and its mark_sent sends it again.
+
+    python -m messages.delivery_worker            # run the worker
+    python -m messages.delivery_worker --stats    # print queue depth and latency
+"""
+
+import argparse
+import asyncio
+import time
+from config.config import get_env_var
+from config.constants import OutboxConfig, DeliveryChannel
+from database.db_connection import close_pool
+from database.outbox_handler import claim_batch, mark_sent, mark_failed, get_outbox_stats, products_from_payload
+from messages.outbox import DIGEST, WATCHLIST
+from runtime.event_bus import event_bus, OUTBOX_ENQUEUED
+
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_POLL_SECONDS = 30
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_TELEGRAM_RATE = 1.0  # 每秒訊息數
+DEFAULT_EMAIL_RATE = 0.5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+STALE_CLAIM_SECONDS = 600   # 超過此秒數仍在 sending 的訊息視為中斷，重新領取
+STATS_INTERVAL_SECONDS = 300
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` messages per second with bursts of `burst`.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        Wait until a message may be sent.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def create_rate_limiters():
+    """
+    One rate limiter per channel, from the OUTBOX_*_RATE settings.
+    """
+    telegram_rate = float(get_env_var(OutboxConfig.OUTBOX_TELEGRAM_RATE.value, DEFAULT_TELEGRAM_RATE))
+    email_rate = float(get_env_var(OutboxConfig.OUTBOX_EMAIL_RATE.value, DEFAULT_EMAIL_RATE))
+    return {
+        DeliveryChannel.TELEGRAM.value: RateLimiter(telegram_rate),
+        DeliveryChannel.EMAIL.value: RateLimiter(email_rate),
+    }
+
+
+def backoff_seconds(attempts):
+    """
+    Delay before the next attempt after `attempts` failed ones.
+    """
+    return min(BACKOFF_BASE_SECONDS * 2 ** attempts, BACKOFF_MAX_SECONDS)
+
+
+async def deliver_message(message):
+    """
+    Send one outbox message. Returns True if it was sent.
+    """
+    # 發送模組 (Telegram、SMTP) 在第一次發送時才載入
+    from messages.sender import send_email_digest, send_telegram_digest, send_watchlist_alert
+
+    channel = message["channel"]
+    payload = message["payload"]
+    products = products_from_payload(payload["products"])
+    kind = payload.get("kind")
+
+    if channel == DeliveryChannel.EMAIL.value and kind == DIGEST:
+        return await send_email_digest(message["recipient"], products)
+    if channel == DeliveryChannel.TELEGRAM.value and kind == DIGEST:
+        return await send_telegram_digest(message["recipient"], products)
+    if channel == DeliveryChannel.TELEGRAM.value and kind == WATCHLIST:
+        return await send_watchlist_alert(message["recipient"], products)
+
+    raise ValueError(f"Unsupported outbox message: {channel}/{kind}")
+
+
+async def process_channel(messages, limiter, max_attempts):
+    """
+    Send one channel's messages in order, within its rate limit.
+    Returns (sent, failed).
+    """
+    sent = failed = 0
+    for message in messages:
+        if limiter is not None:
+            await limiter.acquire()
+        try:
+            delivered = await deliver_message(message)
+            error = None if delivered else "send failed"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if error is None:
+            await asyncio.to_thread(mark_sent, message["id"])
+            sent += 1
+            continue
+
+        attempts = message["attempts"] + 1
+        give_up = attempts >= max_attempts
+        await asyncio.to_thread(mark_failed, message["id"], error, backoff_seconds(message["attempts"]), give_up)
+        failed += 1
+        if give_up:
+            print(f"放棄發送訊息 {message['id']} ({message['channel']}): {error}")
+    return sent, failed
+
+
+async def drain_batch(limiters, batch_size, max_attempts):
+    """
+    Claim one batch and deliver it, the channels in parallel.
+    Returns the number of messages claimed.
+    """
+    messages = await asyncio.to_thread(claim_batch, batch_size, STALE_CLAIM_SECONDS)
+    if not messages:
+        return 0
+
+    by_channel = {}
+    for message in messages:
+        by_channel.setdefault(message["channel"], []).append(message)
+
+    results = await asyncio.gather(*(
+        process_channel(channel_messages, limiters.get(channel), max_attempts)
+        for channel, channel_messages in by_channel.items()
+    ))
+    sent = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    print(f"訊息佇列: 領取 {len(messages)} 則, 成功 {sent}, 失敗 {failed}")
+    return len(messages)
+
+
+def format_outbox_stats(stats):
+    """
+    One line per channel with the queue depth and delivery latency.
+    """
+    if not stats:
+        return ["訊息佇列: 無資料"]
+
+    def seconds(value):
+        return "-" if value is None else f"{value:.1f}s"
+
+    return [
+        f"[{channel}] 待發送 {row['queued']} 則 (最久 {seconds(row['oldest_queued_seconds'])}), "
+        f"失敗放棄 {row['dead']} 則, 近期送達 {row['sent_recently']} 則, "
+        f"延遲 p50 {seconds(row['latency_p50_seconds'])} / p95 {seconds(row['latency_p95_seconds'])}"
+        for channel, row in stats.items()
+    ]
+
+
+def format_media_metrics(metrics):
+    """
+    One line with the photos this process sent and how many reused a cached file_id.
+    """
+    return (
+        f"圖片傳送: {metrics['photos_sent']} 張, 快取命中 {metrics['cache_hits']} / 未命中 {metrics['cache_misses']}, "
+        f"上傳 {metrics['upload_bytes']} bytes, 節省上傳 {metrics['upload_bytes_avoided']} bytes"
+    )
+
+
+def worker_settings():
+    """
+    (batch size, poll seconds, max attempts) from the OUTBOX_* settings.
+    """
+    return (
+        int(get_env_var(OutboxConfig.OUTBOX_BATCH_SIZE.value, DEFAULT_BATCH_SIZE)),
+        float(get_env_var(OutboxConfig.OUTBOX_POLL_SECONDS.value, DEFAULT_POLL_SECONDS)),
+        int(get_env_var(OutboxConfig.OUTBOX_MAX_ATTEMPTS.value, DEFAULT_MAX_ATTEMPTS)),
+    )
+
+
+async def drain_outbox():
+    """
+    Deliver the messages that are due now, then return; used by one-shot runs.
+    Failed messages are scheduled for a later attempt, so this always ends.
+    Returns the number of messages claimed.
+    """
+    batch_size, _, max_attempts = worker_settings()
+    limiters = create_rate_limiters()
+
+    claimed = 0
+    while True:
+        batch = await drain_batch(limiters, batch_size, max_attempts)
+        claimed += batch
+        if batch < batch_size:
+            return claimed
+
+
+async def run_delivery_worker(stop_event=None):
+    """
+    Drain the outbox until stop_event is set.
+
+    The worker polls every OUTBOX_POLL_SECONDS, and immediately when an
+    OUTBOX_ENQUEUED event is published in the same process.
+    """
+    stop_event = stop_event or asyncio.Event()
+    batch_size, poll_seconds, max_attempts = worker_settings()
+    limiters = create_rate_limiters()
+
+    wakeup = asyncio.Event()
+    event_bus.subscribe(OUTBOX_ENQUEUED, wakeup.set)
+    last_stats = 0.0
+    print("訊息發送程序已啟動")
+    try:
+        while not stop_event.is_set():
+            try:
+                # 一批滿了代表可能還有待發送的訊息，繼續領取
+                while not stop_event.is_set() and await drain_batch(limiters, batch_size, max_attempts) >= batch_size:
+                    pass
+
+                if time.monotonic() - last_stats >= STATS_INTERVAL_SECONDS:
+                    last_stats = time.monotonic()
+                    for line in format_outbox_stats(await asyncio.to_thread(get_outbox_stats)):
+                        print(line)
+                    from messages.sender import media_metrics
+                    print(format_media_metrics(media_metrics))
+            except Exception as e:
+                print(f"Error in delivery worker: {e}")
+
+            wakeup.clear()
+            stop_waiter = asyncio.ensure_future(stop_event.wait())
+            wakeup_waiter = asyncio.ensure_future(wakeup.wait())
+            await asyncio.wait({stop_waiter, wakeup_waiter}, timeout=poll_seconds, return_when=asyncio.FIRST_COMPLETED)
+            stop_waiter.cancel()
+            wakeup_waiter.cancel()
+    finally:
+        event_bus.unsubscribe(OUTBOX_ENQUEUED, wakeup.set)
+        print("訊息發送程序已停止")
+
+
+def main():
+    """
+    Entry point of the standalone delivery worker.
+    """
+    parser = argparse.ArgumentParser(description="Deliver the queued notifications.")
+    parser.add_argument("--stats", action="store_true", help="print queue depth and delivery latency, then exit")
+    args = parser.parse_args()
+
+    try:
+        if args.stats:
+            for line in format_outbox_stats(get_outbox_stats()):
+                print(line)
+        else:
+            asyncio.run(run_delivery_worker())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
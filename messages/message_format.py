@@ -2,19 +2,50 @@
 This module provides functions to format product information for email and Telegram messages.
 """
 
+from config.constants import ChangeType
+from scraper.site_adapter import get_site_adapter
+
+LOWEST_PRICE_LABEL = "🔥 史上最低價"
+
+# 摘要的區塊順序與標題
+DIGEST_SECTIONS = (
+    (ChangeType.NEW.value, "🆕 新上架"),
+    (ChangeType.PRICE_DROP.value, "📉 降價"),
+    (ChangeType.SOLD_OUT.value, "❌ 已售完"),
+)
+
+
+def format_price(product_info):
+    """
+    Formats the price of a product, with the previous price when it dropped.
+    """
+    formatted_price = f"${int(product_info.price):,}"
+    previous_price = product_info.previous_price
+    if previous_price is not None and previous_price > product_info.price:
+        formatted_price += f" (原價 ${int(previous_price):,})"
+    return formatted_price
+
+
+def product_url(product_info):
+    """
+    Link to a product on the site it was scraped from.
+    """
+    return get_site_adapter(product_info.site).product_url(product_info.id)
+
+
 def format_email_message(products_info):
     """
     Formats product information into an HTML email format.
     """    
     html_content = "<ul>"
     for product_info in products_info:
-        formatted_price = f"${int(product_info['price']):,}" 
-        product_link = f"https://www.momoshop.com.tw/goods/GoodsDetail.jsp?i_code={product_info['id']}" 
+        formatted_price = format_price(product_info) 
+        product_link = product_url(product_info) 
         html_content += f"""
-            <img src="{product_info['image_url']}" alt="product image" width="100"><br>
-            <strong>品牌名稱:</strong> {product_info['brand']}<br>
-            <strong>商品名稱:</strong> {product_info['product_name']}<br>
-            <strong>價格:</strong> {formatted_price}<br>
+            <img src="{product_info.image_url}" alt="product image" width="100"><br>
+            <strong>品牌名稱:</strong> {product_info.brand}<br>
+            <strong>商品名稱:</strong> {product_info.product_name}<br>
+            <strong>價格:</strong> {formatted_price}{f" <strong>{LOWEST_PRICE_LABEL}</strong>" if product_info.is_lowest_price else ""}<br>
             <strong>購買連結:</strong> <a href="{product_link}">{product_link}</a><br><br>
         """
 
@@ -32,12 +63,13 @@ def format_telegram_message(products_info, max_message_length=4096, batch_size=1
         batch = products_info[i:i + batch_size]
         message = ""
         for product_info in batch:
-            formatted_price = f"${int(product_info['price']):,}"
-            product_link = f"https://www.momoshop.com.tw/goods/GoodsDetail.jsp?i_code={product_info['id']}"
+            formatted_price = format_price(product_info)
+            product_link = product_url(product_info)
             product_message = (
-                f"✨ <b>{product_info['brand']}</b> - {product_info['product_name']}\n"
+                f"✨ <b>{product_info.brand}</b> - {product_info.product_name}\n"
                 f"💰 價格: {formatted_price}\n"
-                f"🔗 <b>購買連結:</b> <a href=\"{product_link}\">{product_link}</a>\n\n"
+                + (f"<b>{LOWEST_PRICE_LABEL}</b>\n" if product_info.is_lowest_price else "")
+                + f"🔗 <b>購買連結:</b> <a href=\"{product_link}\">{product_link}</a>\n\n"
             )
 
             if len(message) + len(product_message) > max_message_length:
@@ -52,4 +84,58 @@ def format_telegram_message(products_info, max_message_length=4096, batch_size=1
         if message:
             messages.append(message)
     
-    return messages
\ No newline at end of file
+    return messages
+
+def format_telegram_caption(product_info, max_caption_length=1024):
+    """
+    Formats a single product into a photo caption.
+    """
+    formatted_price = format_price(product_info)
+    product_link = product_url(product_info)
+    caption = (
+        f"✨ <b>{product_info.brand}</b> - {product_info.product_name}\n"
+        f"💰 價格: {formatted_price}\n"
+        + (f"<b>{LOWEST_PRICE_LABEL}</b>\n" if product_info.is_lowest_price else "")
+        + f"🔗 <a href=\"{product_link}\">購買連結</a>"
+    )
+
+    if len(caption) > max_caption_length:
+        # 名稱過長時只截斷商品名稱，保留價格與連結
+        overflow = len(caption) - max_caption_length + 1
+        caption = caption.replace(product_info.product_name, product_info.product_name[:-overflow] + "…", 1)
+
+    return caption
+
+
+def format_watchlist_alert(products_info):
+    """
+    Formats products that matched a user's watchlist rules into Telegram messages.
+    """
+    messages = format_telegram_message(products_info)
+    if messages:
+        messages[0] = "🔔 <b>追蹤商品上架通知</b>\n\n" + messages[0]
+
+    return messages
+
+
+def group_changes(products_info):
+    """
+    Groups digest products by their change_type, in DIGEST_SECTIONS order.
+    Returns a list of (title, products) for the sections that are not empty.
+    """
+    by_type = {}
+    for product_info in products_info:
+        by_type.setdefault(product_info.change_type, []).append(product_info)
+
+    return [(title, by_type[change_type]) for change_type, title in DIGEST_SECTIONS if change_type in by_type]
+
+
+def format_email_digest(products_info):
+    """
+    Formats the products that changed since the last delivery into an HTML email.
+    """
+    html_content = ""
+    for title, products in group_changes(products_info):
+        html_content += f"<h3>{title} ({len(products)})</h3>" + format_email_message(products)
+
+    return html_content
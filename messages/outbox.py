@@ -0,0 +1,137 @@
+"""
+This module puts notifications into the outbox instead of sending them.
+
+New products and their watchlist alerts are written in one transaction, and
+a digest is enqueued in the same transaction that advances its delivery
+watermark, so a notification is never lost between the data change and the
+send. The delivery worker (messages.delivery_worker) sends them.
+"""
+
+import hashlib
+from datetime import datetime
+import psycopg2
+from config.config import get_env_var
+from config.constants import EmailConfig, TelegramConfig, DeliveryChannel
+from database.db_connection import transaction
+from database.database_handler import insert_product_info
+from database.delivery_handler import get_delivery_watermark, set_delivery_watermark
+from database.outbox_handler import enqueue_notification, products_to_payload
+from database.product_repository import get_product_changes_since
+from database.watchlist_handler import get_all_watchlist_rules
+from runtime.event_bus import event_bus, OUTBOX_ENQUEUED
+from watchlist.matcher import WatchlistMatcher
+
+# 訊息種類
+DIGEST = "digest"
+WATCHLIST = "watchlist"
+
+
+def product_key(product):
+    """
+    Identity of one flash sale of a product.
+    """
+    return f"{product.site}:{product.id}:{product.purchase_start_time}"
+
+
+def build_watchlist_alerts(products, rules):
+    """
+    Match new products against the watchlist rules.
+
+    Returns a list of (chat_id, idempotency_key, payload), one per chat; the
+    key is derived from the matched sales, so re-processing the same products
+    does not alert twice.
+    """
+    if not products or not rules:
+        return []
+
+    alerts = []
+    for chat_id, matches in WatchlistMatcher(rules).match_products(products).items():
+        matched_products = [product for product, _ in matches]
+        digest = hashlib.sha1("|".join(sorted(product_key(product) for product in matched_products)).encode()).hexdigest()
+        payload = {"kind": WATCHLIST, "products": products_to_payload(matched_products)}
+        alerts.append((chat_id, f"{WATCHLIST}:{chat_id}:{digest}", payload))
+
+    return alerts
+
+
+def store_new_products(products):
+    """
+    Insert new products and enqueue their watchlist alerts in one transaction.
+
+    Each insert runs under a savepoint, so a product the database rejects
+    (e.g. "price not found" in the price column) is skipped and logged
+    without rolling back the others. Only inserted products are alerted.
+    Returns (inserted products, number of alerts enqueued).
+    """
+    # 在交易外先讀取規則，交易期間不需再借用第二個連線
+    rules = get_all_watchlist_rules() if products else []
+
+    inserted = []
+    enqueued = 0
+    with transaction() as cursor:
+        for product in products:
+            cursor.execute("SAVEPOINT product_insert;")
+            try:
+                insert_product_info(product, cursor)
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT product_insert;")
+                print(f"插入產品資料失敗: {product.id} - {e}")
+                continue
+            cursor.execute("RELEASE SAVEPOINT product_insert;")
+            inserted.append(product)
+
+        for chat_id, idempotency_key, payload in build_watchlist_alerts(inserted, rules):
+            if enqueue_notification(cursor, DeliveryChannel.TELEGRAM.value, chat_id, idempotency_key, payload):
+                enqueued += 1
+
+    return inserted, enqueued
+
+
+def enqueue_digest(channel, subscriber):
+    """
+    Enqueue the products that changed since a subscriber's watermark and
+    advance the watermark in the same transaction. Returns the number of
+    products enqueued.
+    """
+    delivered_at = datetime.now()
+    since = get_delivery_watermark(channel, subscriber)
+    products = get_product_changes_since(since)
+
+    if not products:
+        print(f"No product changes to send ({channel}).")
+        return 0
+
+    # 以上次的 watermark 為鍵，同一段變動只會排入一次
+    idempotency_key = f"{DIGEST}:{channel}:{subscriber}:{since.isoformat() if since else 'initial'}"
+    payload = {"kind": DIGEST, "products": products_to_payload(products)}
+
+    with transaction() as cursor:
+        if enqueue_notification(cursor, channel, subscriber, idempotency_key, payload):
+            set_delivery_watermark(channel, subscriber, delivered_at, cursor)
+
+    return len(products)
+
+
+def enqueue_notifications():
+    """
+    Enqueue the digests of the configured email and Telegram recipients.
+    Returns the number of products enqueued.
+    """
+    enqueued = 0
+
+    to_email = get_env_var(EmailConfig.RECEIVER_EMAIL.value)
+    if to_email:
+        enqueued += enqueue_digest(DeliveryChannel.EMAIL.value, to_email)
+
+    chat_id = get_env_var(TelegramConfig.TELEGRAM_CHAT_ID.value)
+    if chat_id:
+        enqueued += enqueue_digest(DeliveryChannel.TELEGRAM.value, chat_id)
+
+    return enqueued
+
+
+async def notify_enqueued():
+    """
+    Wake up a delivery worker running in this process.
+    """
+    await event_bus.publish(OUTBOX_ENQUEUED)
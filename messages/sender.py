@@ -3,28 +3,47 @@
 This module handles notification sending by email and Telegram.
 """
 
+import asyncio
+from datetime import datetime
 from smtplib import SMTP, SMTPException
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from telegram import Bot
+from telegram import Bot, InputMediaPhoto
+from telegram.error import BadRequest
 from config.config import get_env_var
-from config.constants import EmailConfig, TelegramConfig
-from database.database_handler import get_all_products_today
-from messages.message_format import format_email_message, format_telegram_message
-
-
-def send_email(subject, body):
+from config.constants import EmailConfig, TelegramConfig, ChangeType
+from database.product_repository import get_product_changes_since
+from database.delivery_handler import get_delivery_watermark, set_delivery_watermark
+from database.media_cache_handler import get_cached_file_ids, save_file_ids, record_cache_hits, delete_file_ids
+from messages.message_format import (
+    format_email_digest, format_telegram_message, format_telegram_caption, format_watchlist_alert, group_changes
+)
+
+MEDIA_GROUP_SIZE = 10  # Telegram 每組相簿最多 10 張
+
+# 本行程的圖片傳送統計，由發送程序定期輸出
+media_metrics = {
+    "photos_sent": 0,
+    "cache_hits": 0,
+    "cache_misses": 0,
+    "upload_bytes": 0,
+    "upload_bytes_avoided": 0,
+}
+
+
+def send_email(subject, body, to_email=None):
     """
-    Sends an email with the specified subject and body.
+    Sends an email with the specified subject and body to `to_email`
+    (default RECEIVER_EMAIL). Returns True if it was sent.
     """    
     from_email = get_env_var(EmailConfig.EMAIL_ACCOUNT.value)
     from_password = get_env_var(EmailConfig.EMAIL_PASSWORD.value)
-    to_email = get_env_var(EmailConfig.RECEIVER_EMAIL.value)
+    to_email = to_email or get_env_var(EmailConfig.RECEIVER_EMAIL.value)
 
     # Ensure required environment variables are set
     if not from_email or not from_password or not to_email:
         print("Email environment variables are not set properly.")
-        return
+        return False
 
     # Create the email content
     msg = MIMEMultipart()  # 建立MIMEMultipart物件
@@ -39,55 +58,190 @@ def send_email(subject, body):
             server.login(from_email, from_password)  # 登入寄件者 gmail
             server.send_message(msg)   # 寄送 email
             print("Email 發送成功")
+            return True
 
     except SMTPException as e:
         print(f"SMTP error when sending email: {e}")
     except OSError as e:
         print(f"Network error when sending email: {e}")
+    return False
 
 
 
-async def send_telegram(messages):
+async def send_telegram_digest(chat_id, products):
+    """
+    Sends a digest of changed products to the Telegram chat. Returns True if it was sent.
     """
-    Sends messages to Telegram chat.
-    """    
     bot_token = get_env_var(TelegramConfig.TELEGRAM_API_TOKEN.value)
-    chat_id = get_env_var(TelegramConfig.TELEGRAM_CHAT_ID.value)
 
     # Ensure required environment variables are set
-    if not bot_token or not chat_id:
-        print("Ensure TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID environment variables are set")
-        return
+    if not bot_token:
+        print("Ensure TELEGRAM_BOT_TOKEN environment variable is set")
+        return False
 
     try:
         bot = Bot(token=bot_token)
-        for message in messages:
-            await bot.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
-        print("Telegram 訊息發送成功")
+        await send_change_digest(bot, chat_id, products)
+        print("Telegram 摘要發送成功")
+        return True
 
     except Exception as e:
-        print(f"Error in send_telegram: {e}")
+        print(f"Error in send_telegram_digest: {e}")
+        return False
 
 
+async def send_change_digest(bot, chat_id, products):
+    """
+    Sends changed products grouped by change type: a header per section, new
+    products and price drops as photo cards, sold-out products as text.
+    """
+    for title, section_products in group_changes(products):
+        await bot.send_message(chat_id=chat_id, text=f"<b>{title}</b> ({len(section_products)})", parse_mode="HTML")
+        if section_products[0].change_type == ChangeType.SOLD_OUT.value:
+            for message in format_telegram_message(section_products):
+                await bot.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
+        else:
+            await send_product_photos(bot, chat_id, section_products)
 
 
-async def send_notifications():
+def has_image(product_info):
+    """
+    Check whether a product has a usable image url.
+    """
+    image_url = product_info.image_url
+    return bool(image_url) and image_url.startswith("http")
+
+
+async def send_product_photos(bot, chat_id, products):
+    """
+    Sends products as photo / media-group messages.
+
+    Each image is uploaded to Telegram once; the returned file_id is cached
+    per image_url and reused by later digests and bot replies. The cache is
+    read once before the first group and written once after the last. A
+    batch whose cached file ids are rejected is sent again from the image
+    urls; products without an image, or whose batch still fails, are sent
+    as text.
+    """
+    with_image = [product for product in products if has_image(product)]
+    without_image = [product for product in products if not has_image(product)]
+
+    cached = await asyncio.to_thread(get_cached_file_ids, {product.image_url for product in with_image})
+
+    new_entries = []
+    hit_urls = []
+    for i in range(0, len(with_image), MEDIA_GROUP_SIZE):
+        batch = with_image[i:i + MEDIA_GROUP_SIZE]
+        try:
+            try:
+                await send_photo_batch(bot, chat_id, batch, cached, new_entries, hit_urls)
+            except BadRequest as e:
+                stale_urls = [product.image_url for product in batch if product.image_url in cached]
+                if not stale_urls:
+                    raise
+                # 快取的 file_id 失效 (例如更換 bot)，刪除快取後改用圖片網址重送
+                print(f"Cached file ids rejected, resending from image urls: {e}")
+                await asyncio.to_thread(delete_file_ids, stale_urls)
+                for image_url in stale_urls:
+                    cached.pop(image_url, None)
+                await send_photo_batch(bot, chat_id, batch, cached, new_entries, hit_urls)
+        except Exception as e:
+            print(f"Error sending photos, falling back to text: {e}")
+            without_image.extend(batch)
+
+    await asyncio.to_thread(save_file_ids, new_entries)
+    await asyncio.to_thread(record_cache_hits, hit_urls)
+
+    for message in format_telegram_message(without_image):
+        await bot.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
+
+
+async def send_photo_batch(bot, chat_id, batch, cached, new_entries, hit_urls):
+    """
+    Sends up to MEDIA_GROUP_SIZE products. New file ids are added to `cached`
+    (so later groups reuse them) and to `new_entries`, reused image urls to
+    `hit_urls`; the caller writes both to the cache.
+    """
+    media_sources = []
+    for product in batch:
+        cached_entry = cached.get(product.image_url)
+        media_sources.append(cached_entry[0] if cached_entry else product.image_url)
+
+    if len(batch) == 1:
+        message = await bot.send_photo(
+            chat_id=chat_id,
+            photo=media_sources[0],
+            caption=format_telegram_caption(batch[0]),
+            parse_mode="HTML",
+        )
+        sent_messages = [message]
+    else:
+        media = []
+        for product, source in zip(batch, media_sources):
+            media.append(InputMediaPhoto(media=source, caption=format_telegram_caption(product), parse_mode="HTML"))
+        sent_messages = await bot.send_media_group(chat_id=chat_id, media=media)
+
+    for product, message in zip(batch, sent_messages):
+        image_url = product.image_url
+        if image_url in cached:
+            hit_urls.append(image_url)
+            media_metrics["cache_hits"] += 1
+            media_metrics["upload_bytes_avoided"] += cached[image_url][1]
+        elif message.photo:
+            photo = message.photo[-1]   # 最大尺寸
+            new_entries.append((image_url, photo.file_id, photo.file_size or 0))
+            cached[image_url] = (photo.file_id, photo.file_size or 0)
+            media_metrics["cache_misses"] += 1
+            media_metrics["upload_bytes"] += photo.file_size or 0
+    media_metrics["photos_sent"] += len(batch)
+
+
+
+
+async def send_email_digest(to_email, products):
     """
-    Fetches products from the database and sends out notifications by email and Telegram.
+    Sends a digest of changed products by email to `to_email`. Returns True if it was sent.
     """
-    products = get_all_products_today()
+    return await asyncio.to_thread(send_email, "特價商品資訊", format_email_digest(products), to_email)
+
+
+async def deliver_digest(channel, subscriber, send):
+    """
+    Sends a subscriber the products that changed since its watermark and
+    advances the watermark. Returns the number of products delivered.
+
+    :param send: Coroutine function (subscriber, products) returning True on success.
+    """
+    delivered_at = datetime.now()
+    since = await asyncio.to_thread(get_delivery_watermark, channel, subscriber)
+    products = await asyncio.to_thread(get_product_changes_since, since)
 
     if not products:
-        print("No products to notify.")
-        return
+        print(f"No product changes to send ({channel}).")
+        return 0
+
+    if not await send(subscriber, products):
+        return 0
+
+    await asyncio.to_thread(set_delivery_watermark, channel, subscriber, delivered_at)
+    return len(products)
 
-    # Prepare email content
-    subject = "特價商品資訊"
-    email_message = format_email_message(products)
 
-    # Prepare Telegram messages
-    telegram_message = format_telegram_message(products)
+async def send_watchlist_alert(chat_id, products):
+    """
+    Pings a chat with the newly listed products that matched its watchlist rules.
+    Returns True if it was sent.
+    """
+    bot_token = get_env_var(TelegramConfig.TELEGRAM_API_TOKEN.value)
+    if not bot_token:
+        print("Ensure TELEGRAM_BOT_TOKEN environment variable is set")
+        return False
 
-    # Send notifications
-    send_email(subject, email_message)
-    await send_telegram(telegram_message)
\ No newline at end of file
+    try:
+        bot = Bot(token=bot_token)
+        for message in format_watchlist_alert(products):
+            await bot.send_message(chat_id=chat_id, text=message, parse_mode="HTML")
+        return True
+    except Exception as e:
+        print(f"Error sending watchlist alert to {chat_id}: {e}")
+        return False
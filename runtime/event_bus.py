@@ -0,0 +1,52 @@
+"""
+This module provides a small in-process publish/subscribe event bus, so the
+scheduler jobs and the bot can react to each other when they share a process.
+"""
+
+import inspect
+
+# 事件名稱
+SCRAPE_COMPLETED = "scrape_completed"
+NOTIFY_COMPLETED = "notify_completed"
+OUTBOX_ENQUEUED = "outbox_enqueued"
+
+
+class EventBus:
+    """
+    Dispatches named events to the callbacks subscribed to them.
+    Callbacks may be plain functions or coroutine functions.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+
+    def subscribe(self, event, callback):
+        """
+        Register a callback for an event.
+        """
+        self._subscribers.setdefault(event, []).append(callback)
+
+    def unsubscribe(self, event, callback):
+        """
+        Remove a previously registered callback.
+        """
+        callbacks = self._subscribers.get(event, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    async def publish(self, event, **payload):
+        """
+        Call every subscriber of the event with the payload as keyword arguments.
+        A failing subscriber does not stop the others.
+        """
+        for callback in list(self._subscribers.get(event, [])):
+            try:
+                result = callback(**payload)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Error in {event} subscriber {getattr(callback, '__name__', callback)}: {e}")
+
+
+# 整個行程共用的事件匯流排
+event_bus = EventBus()
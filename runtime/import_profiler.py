@@ -0,0 +1,83 @@
+"""
+This module measures where startup time goes: the time spent importing
+modules, grouped by top-level package (playwright, telegram, psycopg2, ...).
+It is used by `python main.py --profile-startup <command>`.
+"""
+
+import builtins
+import importlib.util
+import sys
+import time
+from collections import defaultdict
+
+
+class ImportProfiler:
+    """
+    Times first-time imports while active, by wrapping builtins.__import__.
+
+    Each module's own (self) time excludes the imports it triggers, so the
+    per-package times add up to the total import time.
+    """
+
+    def __init__(self):
+        self.self_times = defaultdict(float)
+        self.module_counts = defaultdict(int)
+        self.elapsed = 0.0
+        self._stack = []
+        self._original_import = None
+        self._started = None
+
+    def start(self):
+        """
+        Start timing imports.
+        """
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+        self._started = time.perf_counter()
+
+    def stop(self):
+        """
+        Stop timing imports.
+        """
+        self.elapsed = time.perf_counter() - self._started
+        builtins.__import__ = self._original_import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module_name = name
+        if level:
+            try:
+                module_name = importlib.util.resolve_name("." * level + name, (globals or {}).get("__package__"))
+            except (ImportError, ValueError):
+                pass
+        if module_name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        started = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._stack.pop()
+            package = module_name.partition(".")[0]
+            self.self_times[package] += elapsed - nested
+            self.module_counts[package] += 1
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def report(self, limit=15):
+        """
+        Lines of the startup report: total time, then the slowest packages.
+        """
+        import_total = sum(self.self_times.values())
+        lines = [
+            f"啟動耗時 {self.elapsed * 1000:.1f} ms, 其中 import {import_total * 1000:.1f} ms "
+            f"({sum(self.module_counts.values())} 個模組)"
+        ]
+        ranked = sorted(self.self_times.items(), key=lambda item: item[1], reverse=True)
+        for package, seconds in ranked[:limit]:
+            lines.append(f"  {package:<24} {seconds * 1000:8.1f} ms  ({self.module_counts[package]} 個模組)")
+        if len(ranked) > limit:
+            rest = sum(seconds for _, seconds in ranked[limit:])
+            lines.append(f"  {'(其他)':<24} {rest * 1000:8.1f} ms")
+        return lines
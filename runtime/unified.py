@@ -0,0 +1,88 @@
+"""
+Unified runtime: runs the APScheduler jobs, the Telegram bot and the
+notification delivery worker on one asyncio loop, sharing the database pool,
+the browser and the query caches.
+
+    python -m runtime.unified
+"""
+
+import asyncio
+import signal
+from database.db_connection import close_pool
+from database.query_cache import invalidate_query_cache
+from jobs.schedule_job import create_scheduler, wait_for_active_jobs
+from messages.delivery_worker import run_delivery_worker
+from runtime.event_bus import event_bus, SCRAPE_COMPLETED
+from scraper.browser_pool import browser_pool
+from telegram_bot import build_application
+
+SHUTDOWN_TIMEOUT = 120  # 關閉時等待執行中工作的秒數
+
+
+async def on_scrape_completed(inserted=0, updated=0, skipped=0, cancelled=0, sites=None):
+    """
+    Refresh the bot's view of the data as soon as a scrape finishes.
+    """
+    invalidate_query_cache()
+    partial = f", 略過 {skipped} 筆, 取消 {cancelled} 個網站" if skipped or cancelled else ""
+    print(f"爬蟲完成 (新增 {inserted}, 更新 {updated}{partial})，已清除查詢快取")
+
+
+async def run():
+    """
+    Start the bot and the scheduler and run until SIGINT/SIGTERM.
+    """
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for stop_signal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(stop_signal, stop_event.set)
+        except NotImplementedError:
+            pass  # Windows 不支援 add_signal_handler，改由 KeyboardInterrupt 結束
+
+    # 瀏覽器在多次爬蟲之間共用，於關閉時才釋放
+    browser_pool.keep_alive = True
+    event_bus.subscribe(SCRAPE_COMPLETED, on_scrape_completed)
+
+    application = build_application()
+    scheduler = create_scheduler()
+
+    try:
+        async with application:
+            await application.start()
+            await application.updater.start_polling()
+            scheduler.start()
+            worker_stop = asyncio.Event()
+            worker = asyncio.create_task(run_delivery_worker(worker_stop))
+            print("排程與機器人已啟動")
+
+            await stop_event.wait()
+            print("正在關閉...")
+
+            # 先停止接收新工作，再等待執行中的工作結束
+            scheduler.shutdown(wait=False)
+            await application.updater.stop()
+            await wait_for_active_jobs(timeout=SHUTDOWN_TIMEOUT)
+            # 工作結束後才停止發送程序，讓最後排入的訊息也能送出
+            worker_stop.set()
+            await worker
+            await application.stop()
+    finally:
+        event_bus.unsubscribe(SCRAPE_COMPLETED, on_scrape_completed)
+        await browser_pool.close()
+        close_pool()
+        print("已關閉")
+
+
+def main():
+    """
+    Entry point of the unified runtime.
+    """
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
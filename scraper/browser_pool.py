@@ -0,0 +1,78 @@
+"""
+This module provides a shared Playwright browser. Pages are opened in their
+own browser context, so concurrent tasks stay isolated while reusing a single
+Chromium process instead of launching one per product.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+
+
+class BrowserPool:
+    """
+    Lazily started, shared headless Chromium.
+
+    When `keep_alive` is False the browser is closed after each scrape run;
+    the unified runtime sets it to True so the browser is reused across runs.
+    """
+
+    def __init__(self, keep_alive=False):
+        self.keep_alive = keep_alive
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        """
+        Start Playwright and launch the browser if it is not running.
+        """
+        async with self._lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            return self._browser
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Open a page in a fresh browser context and close the context afterwards.
+        """
+        browser = await self.start()
+        context = await browser.new_context()
+        try:
+            yield await context.new_page()
+        finally:
+            try:
+                await context.close()
+            except Exception as e:
+                print(f"Error closing browser context: {e}")
+
+    async def release(self):
+        """
+        Called at the end of a scrape run; closes the browser unless kept alive.
+        """
+        if not self.keep_alive:
+            await self.close()
+
+    async def close(self):
+        """
+        Close the browser and stop Playwright.
+        """
+        async with self._lock:
+            if self._browser is not None:
+                try:
+                    await self._browser.close()
+                except Exception as e:
+                    print(f"Error closing browser: {e}")
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+
+# 整個行程共用的瀏覽器
+browser_pool = BrowserPool()
@@ -0,0 +1,58 @@
+"""
+This module provides the run-level deadline of a scrape cycle. The deadline
+is passed down to every step of the run, which clamps its own timeouts to the
+time left and stops starting new work once it has passed.
+"""
+
+import asyncio
+import math
+import time
+from config.config import get_env_var
+from config.constants import ScraperConfig
+
+# 預設在下一次整點 55 分的爬蟲之前結束，並保留通知與寫入的時間
+DEFAULT_DEADLINE_SECONDS = 45 * 60
+
+
+class Deadline:
+    """
+    A point in time after which the run stops starting new work.
+    `seconds=None` means no deadline.
+    """
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires_at = math.inf if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        """
+        Seconds left before the deadline (never negative).
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        """
+        Whether the deadline has passed.
+        """
+        return self.remaining() <= 0
+
+    def page_timeout(self, timeout_ms):
+        """
+        A Playwright timeout (ms) clamped to the time left.
+        """
+        return max(1, int(min(timeout_ms, self.remaining() * 1000)))
+
+    async def run(self, awaitable):
+        """
+        Await within the time left; the awaitable is cancelled and
+        asyncio.TimeoutError raised when the deadline passes.
+        """
+        timeout = None if self.expires_at == math.inf else self.remaining()
+        return await asyncio.wait_for(awaitable, timeout)
+
+
+def scrape_deadline():
+    """
+    Deadline of a scrape run, SCRAPE_DEADLINE_SECONDS from now.
+    """
+    return Deadline(float(get_env_var(ScraperConfig.SCRAPE_DEADLINE_SECONDS.value, DEFAULT_DEADLINE_SECONDS)))
@@ -4,6 +4,7 @@ using Playwright's async API.
 """
 import re
 from datetime import datetime
+from database.product_record import ProductRecord
 
 # 尋找所有商品區塊
 async def get_mental_blocks(page):
@@ -100,17 +101,17 @@ async def extract_product_info(product, purchase_time):
 
     product_info_block = f"{purchase_start_time}|{purchase_end_time}|{brand}|{product_name}"
 
-    return {
-        "id": i_code, 
-        "product_info_block": product_info_block,
-        "image": image,
-        "brand": brand,
-        "product_name": product_name,
-        "price": processed_price,
-        "purchase_start_time": purchase_start_time,
-        "purchase_end_time": purchase_end_time,
-        "countdown": countdown,
-    }
+    return ProductRecord(
+        id=i_code, 
+        product_info_block=product_info_block,
+        image_url=image,
+        brand=brand,
+        product_name=product_name,
+        price=processed_price,
+        purchase_start_time=purchase_start_time,
+        purchase_end_time=purchase_end_time,
+        countdown=countdown,
+    )
 
 async def extract_categories(page):
     """
@@ -0,0 +1,44 @@
+"""
+Site adapter for momo (momoshop.com.tw) limited-time sales.
+"""
+
+from config.constants import Site
+from scraper.site_adapter import SiteAdapter, register_site
+from scraper.dom_helpers import (
+    extract_product_info, get_mental_blocks, extract_purchase_time, get_products_from_block, extract_categories
+)
+
+MAIN_PAGE_URL = "https://www.momoshop.com.tw/main/Main.jsp"
+PRODUCT_URL = "https://www.momoshop.com.tw/goods/GoodsDetail.jsp?i_code={i_code}"
+
+
+@register_site
+class MomoAdapter(SiteAdapter):
+    """
+    momo lists its flash sales in time-slot blocks (div.MENTAL) behind the
+    "看全部 >" link of the main page.
+    """
+
+    site = Site.MOMO.value
+
+    def product_url(self, i_code):
+        return PRODUCT_URL.format(i_code=i_code)
+
+    async def open_listing(self, page):
+        await page.goto(MAIN_PAGE_URL, timeout=self.page_timeout)
+        await page.get_by_role("link", name="看全部 >").click()
+        await page.wait_for_load_state('networkidle')
+
+    async def extract_listing(self, page):
+        products = []
+        for block in await get_mental_blocks(page):
+            purchase_time = await extract_purchase_time(block)
+            for product in await get_products_from_block(block):
+                product_info = await extract_product_info(product, purchase_time)
+                if product_info:
+                    product_info.site = self.site
+                    products.append(product_info)
+        return products
+
+    async def extract_categories(self, page):
+        return await extract_categories(page)
@@ -1,137 +1,275 @@
 """
 This module defines the scraping logic for fetching limited sales products
-and their categories from the momo website and updating the database.
+and their categories from the supported shopping sites and updating the
+database. The enabled sites are scraped concurrently in one cycle and share
+the browser pool and the database write path.
 """
 
 import asyncio
 import random
-from playwright.sync_api import Playwright
-from playwright.async_api import async_playwright
-from scraper.scraper_process import momo_limited_sales
-from scraper.dom_helpers import extract_categories
-from database.database_handler import insert_product_info, get_products_with_empty_category, update_product_info
+import time
+from scraper.browser_pool import BrowserPool, browser_pool
+from scraper.deadline import Deadline, scrape_deadline
+from scraper.scraper_process import scrape_listing
+from scraper.site_adapter import get_enabled_adapters
+from database.database_handler import update_product_batch, UPDATE_BATCH_SIZE
+from database.product_record import ProductRecord
+from database.product_repository import get_products_with_empty_category
+from messages.outbox import store_new_products, notify_enqueued
+from runtime.event_bus import event_bus, SCRAPE_COMPLETED
 
-SEMAPHORE_LIMIT = 5  # 最多可以同時處理 5 個商品
-semaphore = asyncio.Semaphore(SEMAPHORE_LIMIT)
+ENRICHMENT_RESERVE_SECONDS = 10 * 60  # 剩餘時間少於此值時不再補抓類別
+DEADLINE_GRACE_SECONDS = 60  # 期限過後仍未結束的網站在此秒數後取消
 
-async def fetch_product_category(product_info, playwright):
+# 每個網站各自的商品頁並行數量限制
+semaphores = {}
+
+
+def get_semaphore(adapter):
+    """
+    Semaphore limiting the product pages opened at once for one site.
+    """
+    if adapter.site not in semaphores:
+        semaphores[adapter.site] = asyncio.Semaphore(adapter.detail_concurrency)
+    return semaphores[adapter.site]
+
+
+def new_site_metrics(site):
+    """
+    Counters of one site's scrape run.
+    """
+    return {
+        "site": site, "listed": 0, "inserted": 0, "updated": 0, "unchanged": 0, "enriched": 0, "detail_failures": 0,
+        "skipped_details": 0, "skipped_updates": 0, "skipped_enrichment": 0, "deadline_hit": False, "cancelled": False,
+        "seconds": 0.0,
+    }
+
+
+def skipped_count(metrics):
+    """
+    Rows of a site's run left for the next run because of the deadline.
+    """
+    return metrics["skipped_details"] + metrics["skipped_updates"] + metrics["skipped_enrichment"]
+
+
+def format_site_metrics(metrics):
+    """
+    One line summary of a site's scrape run, with its throughput.
+    """
+    if metrics["cancelled"]:
+        return f"[{metrics['site']}] 超過執行期限 {metrics['seconds']:.1f} 秒，已取消 (下次執行補上)"
+
+    seconds = metrics["seconds"] or float("nan")
+    line = (
+        f"[{metrics['site']}] 列表 {metrics['listed']} 筆, 新增 {metrics['inserted']}, 更新 {metrics['updated']}, "
+        f"未變動略過 {metrics['unchanged']}, "
+        f"補類別 {metrics['enriched']}, 商品頁失敗 {metrics['detail_failures']}, "
+        f"耗時 {metrics['seconds']:.1f} 秒 ({metrics['listed'] / seconds:.1f} 筆/秒)"
+    )
+    if metrics["deadline_hit"]:
+        line += (
+            f", 已達期限: 略過商品頁 {metrics['skipped_details']}, 略過更新 {metrics['skipped_updates']}, "
+            f"略過補類別 {metrics['skipped_enrichment']} (下次執行補上)"
+        )
+    return line
+
+async def fetch_product_category(product_info, pool: BrowserPool, adapter, metrics=None, deadline=None):
     """
-    Fetch the category information for a product.
+    Fetch the category information for a product from its site's product page.
+
+    Past the deadline the page is not opened (or is abandoned) and the
+    product is returned without categories, so a later run enriches it.
     """    
-    async with semaphore:  # 使用 Semaphore 限制同時處理數量
-        try:
-            delay = random.uniform(1, 3)  # Random delay 1 to 3 seconds
-            await asyncio.sleep(delay)
+    deadline = deadline or Deadline()
 
-            browser = await playwright.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await context.new_page()
-            product_link = f"https://www.momoshop.com.tw/goods/GoodsDetail.jsp?i_code={product_info['id']}"
-            await page.goto(product_link, timeout=60000)
+    async def load_categories():
+        async with pool.page() as page:
+            product_link = adapter.product_url(product_info.id)
+            await page.goto(product_link, timeout=deadline.page_timeout(adapter.page_timeout))
 
-            categories = await extract_categories(page)
-            await browser.close()
+            return await adapter.extract_categories(page)
 
+    async with get_semaphore(adapter):  # 使用 Semaphore 限制同時處理數量
+        try:
+            delay = random.uniform(1, 3)  # Random delay 1 to 3 seconds
+            await asyncio.sleep(min(delay, deadline.remaining()))
+            if deadline.expired():
+                raise asyncio.TimeoutError
+
+            categories = await deadline.run(load_categories())
 
             # Handle returned categories
             if categories is None:
-                product_info["categories"] = []  # Failed to load categories
+                product_info.categories = []  # Failed to load categories
             elif not categories:
-                product_info["categories"] = ["其他"]  # Default to "其他" if categories are empty
+                product_info.categories = ["其他"]  # Default to "其他" if categories are empty
             else:
-                product_info["categories"] = categories  # Successfully fetched categories
+                product_info.categories = categories  # Successfully fetched categories
 
+            return product_info
+        except asyncio.TimeoutError:
+            if metrics is not None:
+                metrics["skipped_details"] += 1
+            product_info.categories = []  # 超過期限，留待下次補上類別
             return product_info
         except Exception as e:
-            print(f"Failed to fetch details for product {product_info['id']}: {e}")
-            product_info["categories"] = []  # Failed categories
+            print(f"Failed to fetch details for product {product_info.id}: {e}")
+            if metrics is not None:
+                metrics["detail_failures"] += 1
+            product_info.categories = []  # Failed categories
             return product_info
 
-async def fetch_limited_sales_products (local_playwright: Playwright, max_retries=3) -> None:
+async def fetch_limited_sales_products (pool: BrowserPool, adapter, max_retries=3, deadline=None):
     """
-    Fetch limited sales products and process their details.
+    Fetch one site's limited sales products and process their details.
+    Returns the site's metrics.
+
+    Work is done in priority order (new products, then updates, then
+    re-enriching rows without a category) and shed from the end when the
+    deadline comes close; skipped rows keep their state and are picked up
+    by the next run.
     """    
+    deadline = deadline or Deadline()
+    metrics = new_site_metrics(adapter.site)
+    started = time.perf_counter()
     retries = 0
     while retries < max_retries:
         try:
-            print("開始爬取商品資料...")
-            browser = await local_playwright.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await context.new_page()
-            await page.goto("https://www.momoshop.com.tw/main/Main.jsp", timeout=60000)
-            await page.get_by_role("link", name="看全部 >").click()
-            await page.wait_for_load_state('networkidle')
-
-            # 抓取頁面上的產品資訊
-            products = await momo_limited_sales(page)
-            print("爬取商品成功，開始處理資料...")
+            metrics = new_site_metrics(adapter.site)  # 重試時重新計數
+            print(f"[{adapter.site}] 開始爬取商品資料...")
+            async with pool.page() as page:
+                await deadline.run(adapter.open_listing(page))
+
+                # 抓取頁面上的產品資訊
+                products = await deadline.run(scrape_listing(adapter, page))
+            metrics["listed"] = len(products["toInsert"]) + len(products["toUpdate"]) + len(products["unchanged"])
+            metrics["unchanged"] = len(products["unchanged"])
+            print(f"[{adapter.site}] 爬取商品成功，開始處理資料...")
 
             # 處理需要插入的產品資料 (toInsert)
             if(len(products['toInsert'])) != 0:
-                async with async_playwright() as playwright:
+                tasks = []
+                for product in products["toInsert"]:
+                    task = fetch_product_category(product, pool, adapter, metrics, deadline)
+                    tasks.append(task)
+
+                detailed_products_info = await asyncio.gather(*tasks, return_exceptions=True)
 
-                    tasks = []
-                    for product in products["toInsert"]:
-                        task = fetch_product_category(product, playwright)
-                        tasks.append(task)
+                # 新商品與其追蹤通知在同一筆交易中寫入 (在執行緒中寫入，其他網站的爬取不會被阻塞)
+                # 已爬到的新商品即使超過期限也寫入，未取得的類別由下次執行補上
+                new_products = [info for info in detailed_products_info if isinstance(info, ProductRecord)]
+                inserted_products = []
+                if new_products:
+                    inserted_products, alerts = await asyncio.to_thread(store_new_products, new_products)
+                    print(f"[{adapter.site}] 插入產品資料成功: {len(inserted_products)} 筆, 追蹤通知 {alerts} 則")
+                    if alerts:
+                        await notify_enqueued()
+                metrics["inserted"] = len(inserted_products)
 
-                    detailed_products_info = await asyncio.gather(*tasks, return_exceptions=True)
+            # 處理有變動的產品資料 (toUpdate)，分批寫入；超過期限後停止，下次爬取時仍會在列表中
+            to_update = products["toUpdate"]
+            for i in range(0, len(to_update), UPDATE_BATCH_SIZE):
+                if deadline.expired():
+                    metrics["skipped_updates"] = len(to_update) - i
+                    break
+                batch = to_update[i:i + UPDATE_BATCH_SIZE]
+                try:
+                    metrics["updated"] += await asyncio.to_thread(update_product_batch, batch)
+                except Exception as e:
+                    print(f"[{adapter.site}] 更新產品資料失敗 ({len(batch)} 筆): {e}")
 
-                # 插入成功爬取的產品資料到資料庫
-                for products_info in detailed_products_info:
-                    if isinstance(products_info, dict):
-                        insert_product_info(products_info)
-                        print(f"插入產品資料成功: {products_info['id']}")           
+            # 查詢資料庫中此網站類別為空的產品
+            empty_category_products = await asyncio.to_thread(get_products_with_empty_category, site=adapter.site)
 
-            # 處理需要更新的產品資料 (toUpdate)
-            if len(products["toUpdate"]) != 0:
-                for product in products["toUpdate"]:
+            # 爬取並更新類別資料 (低優先，剩餘時間不足時整批略過，類別仍為空的商品下次會再查到)
+            if empty_category_products and deadline.remaining() < ENRICHMENT_RESERVE_SECONDS:
+                metrics["skipped_enrichment"] = len(empty_category_products)
+            elif empty_category_products:
+                tasks = []
+                for product in empty_category_products:
+                    task = fetch_product_category(product, pool, adapter, metrics, deadline)
+                    tasks.append(task)
+                detailed_products_info = await asyncio.gather(*tasks, return_exceptions=True)
+
+                # 只寫回成功取得類別的產品資料
+                enriched_products = [
+                    info for info in detailed_products_info if isinstance(info, ProductRecord) and info.categories
+                ]
+                if enriched_products:
                     try:
-                        update_product_info(product)
-                        print(f"更新產品資料成功: {product['id']}")
+                        metrics["enriched"] = await asyncio.to_thread(update_product_batch, enriched_products)
                     except Exception as e:
-                        print(f"更新產品資料失敗: {product['id']} - {e}")                    
-
-            # 查詢資料庫中類別為空的產品
-            empty_category_products = get_products_with_empty_category()
-
-            # 爬取並更新類別資料
-            if empty_category_products:
-                async with async_playwright() as playwright:
-                    tasks = []
-                    for product in empty_category_products:
-                        task = fetch_product_category(product, playwright)
-                        tasks.append(task)
-                    detailed_products_info = await asyncio.gather(*tasks, return_exceptions=True)
-
-                # 更新成功爬取的產品資料
-                for products_info in detailed_products_info:
-                    if isinstance(products_info, dict):
-                        print(f"爬取產品類別成功: {products_info['id']}")
-                        update_product_info(products_info)
-
-            await context.close()
-            await browser.close()
-            return
+                        print(f"[{adapter.site}] 更新產品類別失敗 ({len(enriched_products)} 筆): {e}")
+
+            metrics["deadline_hit"] = bool(
+                deadline.expired() or metrics["skipped_details"] or metrics["skipped_updates"]
+                or metrics["skipped_enrichment"]
+            )
+            metrics["seconds"] = time.perf_counter() - started
+            return metrics
         except Exception as e:
+            if deadline.expired():
+                print(f"[{adapter.site}] 已達執行期限，停止重試: {type(e).__name__} - {e}")
+                metrics["deadline_hit"] = True
+                break
             retries += 1
-            print(f"Error in run: {type(e).__name__} - {e}. Retrying {retries}/{max_retries}...")
-            await asyncio.sleep(2)
-        finally:
-            try:
-                await browser.close()
-            except Exception as e:
-                print(f"Error closing browser: {e}")
+            print(f"[{adapter.site}] Error in run: {type(e).__name__} - {e}. Retrying {retries}/{max_retries}...")
+            await asyncio.sleep(min(2, deadline.remaining()))
 
-    print("Max retries reached. Exiting run.")
+    if not metrics["deadline_hit"]:
+        print(f"[{adapter.site}] Max retries reached. Exiting run.")
+    metrics["seconds"] = time.perf_counter() - started
+    return metrics
 
 
 
 async def scrape_job():
     """
-    Run the scrape job to fetch limited sales products.
+    Run the scrape job: every enabled site is scraped concurrently within
+    the run's deadline (SCRAPE_DEADLINE_SECONDS).
+
+    A site still running DEADLINE_GRACE_SECONDS after the deadline (e.g. a
+    database write that does not return) is cancelled. SCRAPE_COMPLETED
+    carries the rows skipped at the deadline and the number of cancelled
+    sites, so subscribers can tell a partial run from a complete one.
     """    
-    async with async_playwright() as local_playwright:
-        await fetch_limited_sales_products (local_playwright)
-    
+    adapters = get_enabled_adapters()
+    deadline = scrape_deadline()
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(
+                    fetch_limited_sales_products (browser_pool, adapter, deadline=deadline),
+                    deadline.remaining() + DEADLINE_GRACE_SECONDS,
+                )
+                for adapter in adapters
+            ),
+            return_exceptions=True,
+        )
+    finally:
+        await browser_pool.release()
+
+    site_metrics = []
+    for adapter, result in zip(adapters, results):
+        if isinstance(result, asyncio.TimeoutError):
+            # 取消的網站也列入統計，讓訂閱者分辨部分完成的執行
+            result = new_site_metrics(adapter.site)
+            result.update(deadline_hit=True, cancelled=True, seconds=time.perf_counter() - started)
+        elif isinstance(result, Exception):
+            print(f"[{adapter.site}] 爬取失敗: {result}")
+            continue
+        site_metrics.append(result)
+        print(format_site_metrics(result))
+
+    # 通知同一行程中的其他元件 (例如機器人的查詢快取)
+    await event_bus.publish(
+        SCRAPE_COMPLETED,
+        inserted=sum(metrics["inserted"] for metrics in site_metrics),
+        updated=sum(metrics["updated"] for metrics in site_metrics),
+        skipped=sum(skipped_count(metrics) for metrics in site_metrics),
+        cancelled=sum(metrics["cancelled"] for metrics in site_metrics),
+        sites=site_metrics,
+    )
+
     print("執行完畢")
\ No newline at end of file
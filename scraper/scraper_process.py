@@ -1,41 +1,43 @@
 """Module for processing product information from a webpage."""
-from scraper.dom_helpers import extract_product_info, get_mental_blocks, extract_purchase_time ,get_products_from_block
-from database.database_handler import is_product_in_database
+import asyncio
+from database.product_snapshot import ProductSnapshot
 
-async def momo_limited_sales(page):
-    """Extract product information from the webpage and classify them for insertion or update in the database."""    
+async def scrape_listing(adapter, page):
+    """Extract product information from a site's listing page and classify them for insertion or update in the database."""
 
-    products_insert = [] 
+    products_insert = []
     product_update = []
+    product_unchanged = []
+    listed = []
 
-    mental_blocks = await get_mental_blocks(page)
-    for block in mental_blocks:
+    for product_info in await adapter.extract_listing(page):
 
-        purchase_time = await extract_purchase_time(block)
+        # Skip products without an i_code
+        if not product_info or not product_info.id:
+            print("Missing i_code.")
+            continue
 
-        products = await get_products_from_block(block)
+        # Skip products without purchase start and end times
+        if product_info.purchase_start_time is None or product_info.purchase_end_time is None:
+            print(f"Skipping product due to missing purchase time: {product_info}")
+            continue
 
-        for product in products:
-            product_info = await extract_product_info(product, purchase_time)
+        listed.append(product_info)
 
-            # Skip products without an i_code
-            if not product_info or not product_info["id"]:
-                print("Missing i_code.")
-                continue
+    # 一次查詢取回列表商品目前的資料 (在執行緒中查詢，其他網站的爬取不會被阻塞)
+    snapshot = await asyncio.to_thread(ProductSnapshot.load, adapter.site, listed)
 
-            # Skip products without purchase start and end times
-            if product_info["purchase_start_time"] is None or product_info["purchase_end_time"] is None:
-                print(f"Skipping product due to missing purchase time: {product_info}")
-                continue       
+    for product_info in listed:
+        if not snapshot.contains(product_info):
+            products_insert.append(product_info)   # Add new product to insertion list
+        elif snapshot.is_dirty(product_info):
+            product_update.append(product_info)
+        else:
+            product_unchanged.append(product_info)   # 價格與庫存都沒變，不需寫入
 
-            # Check if the product already exists in the database
-            if is_product_in_database(product_info["product_info_block"]):
-                product_update.append(product_info)
-            else:
-                products_insert.append(product_info)   # Add new product to insertion list
-                
 
     return {
         'toInsert': products_insert,
-        'toUpdate': product_update
+        'toUpdate': product_update,
+        'unchanged': product_unchanged,
     }
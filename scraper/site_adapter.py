@@ -0,0 +1,103 @@
+"""
+This module defines the interface every scraped shopping site implements and
+the registry of available sites. An adapter knows how to open its flash-sale
+listing, extract the products on it, enrich a product from its detail page
+and build the link to a product; the scrape cycle, browser pool and database
+writes are shared by all sites.
+"""
+
+from abc import ABC, abstractmethod
+from inspect import isabstract
+from config.config import get_env_var
+from config.constants import ScraperConfig, Site
+
+
+class SiteAdapter(ABC):
+    """
+    Base class of the site adapters.
+
+    Subclasses set `site` (stored in the products' site column) and
+    implement the listing / detail methods; an adapter missing one of them
+    cannot be registered or instantiated.
+    """
+
+    site = None
+    detail_concurrency = 5  # 同時開啟的商品頁數量上限
+    page_timeout = 60000
+
+    @abstractmethod
+    def product_url(self, i_code):
+        """
+        Link to a product page.
+        """
+
+    @abstractmethod
+    async def open_listing(self, page):
+        """
+        Navigate the page to the site's flash-sale listing.
+        """
+
+    @abstractmethod
+    async def extract_listing(self, page):
+        """
+        Extract the products of the listing as ProductRecord objects.
+        """
+
+    @abstractmethod
+    async def extract_categories(self, page):
+        """
+        Extract the categories from a product page opened at product_url.
+
+        Returns a list of categories, an empty list when the page has none,
+        or None when they could not be loaded.
+        """
+
+
+# site -> adapter 類別，新增網站時在此註冊
+SITE_ADAPTERS = {}
+
+
+def register_site(adapter_class):
+    """
+    Class decorator adding an adapter to the registry.
+    """
+    if isabstract(adapter_class):
+        missing = ", ".join(sorted(adapter_class.__abstractmethods__))
+        raise TypeError(f"{adapter_class.__name__} does not implement: {missing}")
+    if not adapter_class.site:
+        raise TypeError(f"{adapter_class.__name__} does not set site")
+    SITE_ADAPTERS[adapter_class.site] = adapter_class
+    return adapter_class
+
+
+def load_site_adapters():
+    """
+    Import the adapter modules so they register themselves.
+    """
+    import scraper.momo_adapter  # noqa: F401
+
+
+def get_site_adapter(site):
+    """
+    Return an adapter instance for a site, defaulting to momo for rows stored
+    before the site column existed.
+    """
+    load_site_adapters()
+    return SITE_ADAPTERS[site or Site.MOMO.value]()
+
+
+def get_enabled_adapters():
+    """
+    Return adapters for the sites listed in SCRAPER_SITES (comma separated, default momo).
+    """
+    load_site_adapters()
+    sites = get_env_var(ScraperConfig.SCRAPER_SITES.value, Site.MOMO.value)
+
+    adapters = []
+    for site in sites.split(","):
+        site = site.strip()
+        if site in SITE_ADAPTERS:
+            adapters.append(SITE_ADAPTERS[site]())
+        elif site:
+            print(f"Unknown site in {ScraperConfig.SCRAPER_SITES.value}: {site}")
+    return adapters
@@ -1,15 +1,31 @@
 """
 Telegram Bot for Special Offer Product Inquiry.
+
+The bot can run in polling mode (default) or as a webhook server:
+
+    python telegram_bot.py            # polling
+    python telegram_bot.py webhook    # webhook server
 """
 
+import asyncio
+import html
+import sys
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 from config.config import get_env_var
-from database.database_handler import get_all_categories, get_products_by_category, get_all_products_today
-from messages.message_format import format_telegram_message
+from config.constants import TelegramConfig, WatchlistRuleType, DeliveryChannel
+from database.database_handler import get_all_categories
+from database.product_repository import get_products_by_category, get_all_products_today
+from database.query_cache import cached_query
+from database.watchlist_handler import add_watchlist_rule, remove_watchlist_rule, get_watchlist_rules
+from messages.sender import send_product_photos, send_change_digest, deliver_digest
 
 bot_token = get_env_var("TELEGRAM_API_TOKEN")
 
+DEFAULT_CONCURRENT_UPDATES = 16  # 同時處理的 update 數量上限
+DEFAULT_WEBHOOK_LISTEN = "0.0.0.0"
+DEFAULT_WEBHOOK_PORT = 8443
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -28,7 +44,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "請直接點擊選單按鈕或選擇以下指令：\n"
             "/about - 關於機器人\n"
             "/categories - 選擇類別\n"
-            "/all - 所有商品"
+            "/all - 所有商品\n"
+            "/new - 上次查看後的新商品、降價與售完\n"
+            "/watch - 新增追蹤條件\n"
+            "/watchlist - 查看追蹤條件"
         ),
         parse_mode="HTML",
         reply_markup=reply_markup,
@@ -47,8 +66,12 @@ async def about_bot(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "2. <b>查詢搶購商品</b>\n"
         "   ● 根據選擇的類別，顯示符合條件的商品資訊。\n"
         "3. <b>查詢所有商品</b>\n"
-        "   ● 直接輸入 /all ，查看當日所有商品的特價資訊\n\n"
-        "<i>機器人每天 <b>00:00</b> 會主動發送當日的商品資訊\n\n</i>"
+        "   ● 直接輸入 /all ，查看當日所有商品的特價資訊\n"
+        "4. <b>查詢變動</b>\n"
+        "   ● 輸入 /new ，只查看上次查看後新上架、降價與售完的商品\n"
+        "5. <b>追蹤商品</b>\n"
+        "   ● 使用 /watch 設定品牌、關鍵字或價格條件，符合的商品上架時立即通知\n\n"
+        "<i>機器人每天 <b>00:00</b> 會主動發送當日的商品資訊，白天每小時只發送新的變動\n\n</i>"
         "<i>此資料非即時性更新，若有與官網不符請依照官網為準。祝您使用愉快！</i>"
     ),
     parse_mode="HTML",
@@ -59,7 +82,7 @@ async def categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle the /categories command and provide a list of categories for users to select.
     """    
-    categories_list  = get_all_categories()
+    categories_list  = await asyncio.to_thread(cached_query, get_all_categories)
 
     if not categories_list :
         await update.message.reply_text("目前沒有可用的類別。")
@@ -80,62 +103,206 @@ async def all_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle the /all command and display all products for the current day.
     """
-    products = get_all_products_today()
+    products = await asyncio.to_thread(cached_query, get_all_products_today)
 
     if not products:
         await update.message.reply_text("今天沒有任何商品資訊。")
         return
 
-    messages = format_telegram_message(products)
+    await send_product_photos(context.bot, update.effective_chat.id, products)
+
+async def new_products(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle the /new command and display only what changed since the chat's last /new.
+    """
+    chat_id = update.effective_chat.id
 
-    for message in messages:
-        await update.message.reply_text(
-            text=message,
-            parse_mode="HTML"
-        )
+    async def send(_, products):
+        await send_change_digest(context.bot, chat_id, products)
+        return True
+
+    delivered = await deliver_digest(DeliveryChannel.BOT.value, chat_id, send)
+    if not delivered:
+        await update.message.reply_text("上次查看後沒有新的變動。")
 
 async def handle_category_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle the category selection by the user and display matching products.
     """    
     selected_category = update.message.text  # Get the category selected by the user
-    products = get_products_by_category(selected_category)
 
     if selected_category == "全部":
-        products = get_all_products_today()
+        products = await asyncio.to_thread(cached_query, get_all_products_today)
+    elif selected_category in await asyncio.to_thread(cached_query, get_all_categories):
+        # 只有已知的類別才查詢並快取，任意輸入的文字不會佔用快取
+        products = await asyncio.to_thread(cached_query, get_products_by_category, selected_category)
     else:
-        products = get_products_by_category(selected_category)
+        products = None
 
     if not products:
         await update.message.reply_text(f"「{selected_category}」不是有效的商品類別。請選擇一個有效的類別或使用指令。")
         return
-    messages = format_telegram_message(products)
 
+    await send_product_photos(context.bot, update.effective_chat.id, products)
 
-    for message in messages:
-        await update.message.reply_text(
-            text=message,
-            parse_mode="HTML"
-        )
 
+WATCH_USAGE = (
+    "用法：\n"
+    "/watch brand &lt;品牌&gt; - 品牌包含關鍵字\n"
+    "/watch keyword &lt;關鍵字&gt; - 商品名稱包含關鍵字\n"
+    "/watch price &lt;金額&gt; - 價格低於金額"
+)
 
+async def watch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle the /watch command and register an alert rule for the chat.
+    """
+    rule_types = [rule_type.value for rule_type in WatchlistRuleType]
+    if len(context.args) < 2 or context.args[0] not in rule_types:
+        await update.message.reply_text(WATCH_USAGE, parse_mode="HTML")
+        return
 
+    rule_type = context.args[0]
+    pattern = " ".join(context.args[1:]).strip()
 
-def main():
+    if rule_type == WatchlistRuleType.PRICE_BELOW.value:
+        try:
+            pattern = str(int(pattern.replace(",", "").replace("$", "")))
+        except ValueError:
+            await update.message.reply_text("價格必須是數字，例如：/watch price 500")
+            return
+
+    rule_id = await asyncio.to_thread(add_watchlist_rule, update.effective_chat.id, rule_type, pattern)
+    if rule_id is None:
+        await update.message.reply_text("新增追蹤條件失敗，請稍後再試。")
+        return
+
+    await update.message.reply_text(f"已新增追蹤條件 #{rule_id}：{rule_type} {pattern}")
+
+async def watchlist(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    Main entry point of the bot application. Configures command handlers and starts polling.
-    """    
-    application = Application.builder().token(bot_token).build()
+    Handle the /watchlist command and list the chat's alert rules.
+    """
+    rules = await asyncio.to_thread(get_watchlist_rules, update.effective_chat.id)
+
+    if not rules:
+        await update.message.reply_text("目前沒有追蹤條件，使用 /watch 新增。")
+        return
+
+    lines = ["目前的追蹤條件（使用 /unwatch &lt;編號&gt; 移除）："]
+    for rule in rules:
+        lines.append(f"#{rule['id']} {html.escape(rule['rule_type'])} {html.escape(rule['pattern'])}")
+
+    await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+
+async def unwatch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handle the /unwatch command and remove one of the chat's alert rules.
+    """
+    try:
+        rule_id = int(context.args[0].lstrip("#"))
+    except (IndexError, ValueError):
+        await update.message.reply_text("用法：/unwatch <編號>")
+        return
+
+    if await asyncio.to_thread(remove_watchlist_rule, update.effective_chat.id, rule_id):
+        await update.message.reply_text(f"已移除追蹤條件 #{rule_id}")
+    else:
+        await update.message.reply_text(f"找不到追蹤條件 #{rule_id}")
+
+
+def build_application():
+    """
+    Build the bot Application with all handlers registered.
+
+    Updates are processed concurrently up to TELEGRAM_CONCURRENT_UPDATES;
+    database calls in the handlers run in worker threads so a slow query
+    does not block the other updates.
+    """
+    concurrent_updates = int(get_env_var(
+        TelegramConfig.TELEGRAM_CONCURRENT_UPDATES.value, DEFAULT_CONCURRENT_UPDATES
+    ))
+
+    builder = Application.builder().token(bot_token).concurrent_updates(concurrent_updates)
+
+    # 可指向本機的 Bot API 替身，用於壓力測試
+    base_url = get_env_var(TelegramConfig.TELEGRAM_BASE_URL.value)
+    if base_url:
+        builder = builder.base_url(base_url)
+
+    application = builder.build()
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("about", about_bot))
     application.add_handler(CommandHandler("categories", categories))
     application.add_handler(CommandHandler("all", all_products))
+    application.add_handler(CommandHandler("new", new_products))
+    application.add_handler(CommandHandler("watch", watch))
+    application.add_handler(CommandHandler("watchlist", watchlist))
+    application.add_handler(CommandHandler("unwatch", unwatch))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_category_selection))  # Handle text input for category selection
 
+    return application
+
+
+def run_polling(application):
+    """
+    Start the bot in polling mode.
+    """
     application.run_polling()
 
 
+def run_webhook(application):
+    """
+    Start the bot as a webhook server.
+
+    The server shuts down gracefully on SIGINT/SIGTERM: it stops accepting
+    updates, waits for in-flight handlers to finish and then exits.
+    """
+    listen = get_env_var(TelegramConfig.TELEGRAM_WEBHOOK_LISTEN.value, DEFAULT_WEBHOOK_LISTEN)
+    port = int(get_env_var(TelegramConfig.TELEGRAM_WEBHOOK_PORT.value, DEFAULT_WEBHOOK_PORT))
+    url_path = get_env_var(TelegramConfig.TELEGRAM_WEBHOOK_PATH.value, "telegram")
+    webhook_url = get_env_var(TelegramConfig.TELEGRAM_WEBHOOK_URL.value)
+    secret_token = get_env_var(TelegramConfig.TELEGRAM_WEBHOOK_SECRET.value)
+
+    # 未設定公開網址時 PTB 會以監聽位址 (0.0.0.0) 註冊 webhook，Telegram 無法連線
+    if not webhook_url:
+        sys.exit("TELEGRAM_WEBHOOK_URL must be set to the public HTTPS URL of the webhook in webhook mode.")
+
+    application.run_webhook(
+        listen=listen,
+        port=port,
+        url_path=url_path,
+        webhook_url=webhook_url,
+        secret_token=secret_token,
+        allowed_updates=Update.ALL_TYPES,
+    )
+
+
+def run_bot(mode=None):
+    """
+    Build the bot and start polling or the webhook server. The mode defaults
+    to TELEGRAM_MODE (polling).
+    """
+    mode = mode or get_env_var(TelegramConfig.TELEGRAM_MODE.value, "polling")
+
+    application = build_application()
+
+    if mode == "webhook":
+        run_webhook(application)
+    elif mode == "polling":
+        run_polling(application)
+    else:
+        print(f"Unknown mode: {mode}. Use 'polling' or 'webhook'.")
+
+
+def main():
+    """
+    Main entry point of the bot application. Configures command handlers and
+    starts polling or the webhook server, depending on the selected mode.
+    """
+    run_bot(sys.argv[1] if len(sys.argv) > 1 else None)
+
+
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
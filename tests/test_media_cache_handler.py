@@ -0,0 +1,38 @@
+"""
+Tests of the Telegram media cache writes.
+"""
+
+import unittest
+from unittest import mock
+from database import media_cache_handler
+
+
+class SaveFileIdsTest(unittest.TestCase):
+
+    def test_duplicate_image_url_is_written_once(self):
+        """
+        Products of one media group sharing an image must not put the same
+        image_url twice in the upsert, which Postgres rejects.
+        """
+        entries = [
+            ("https://img/a.jpg", "file-a1", 100),
+            ("https://img/b.jpg", "file-b", 200),
+            ("https://img/a.jpg", "file-a2", 150),
+        ]
+        with mock.patch.object(media_cache_handler, "execute_query") as execute_query:
+            media_cache_handler.save_file_ids(entries)
+
+        query, params = execute_query.call_args.args
+        self.assertEqual(query.count("(%s, %s, %s, 0, %s, %s)"), 2)
+        self.assertEqual(params[0::5], ("https://img/a.jpg", "https://img/b.jpg"))
+        self.assertEqual(params[1::5], ("file-a2", "file-b"))
+
+    def test_no_entries_skips_the_query(self):
+        with mock.patch.object(media_cache_handler, "execute_query") as execute_query:
+            media_cache_handler.save_file_ids([])
+
+        execute_query.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+This module compiles watchlist rules into a matching engine.
+
+Keyword rules (brand / product name contains X) are compiled into an
+Aho-Corasick automaton so every product is scanned once regardless of how
+many keywords are registered. Price rules are kept as a sorted list of
+thresholds, so the matching rules are found with a single binary search.
+"""
+
+from bisect import bisect_right
+from collections import deque
+from config.constants import WatchlistRuleType
+
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher built from a set of (pattern, value) pairs.
+    """
+
+    def __init__(self):
+        self._goto = [{}]       # 每個狀態的轉移表
+        self._fail = [0]        # 失敗連結
+        self._output = [[]]     # 每個狀態結束時命中的值
+        self._built = False
+
+    def add(self, pattern, value):
+        """
+        Add a pattern; `value` is reported whenever the pattern is found.
+        """
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(value)
+        self._built = False
+
+    def build(self):
+        """
+        Compute failure links with a breadth-first walk of the trie.
+        """
+        queue = deque()
+        for next_state in self._goto[0].values():
+            self._fail[next_state] = 0
+            queue.append(next_state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # 合併失敗連結上的輸出，查詢時不必再沿著失敗連結走
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+        self._built = True
+
+    def search(self, text):
+        """
+        Return the set of values whose pattern occurs in `text`.
+        """
+        if not self._built:
+            self.build()
+
+        matches = set()
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                matches.update(output[state])
+        return matches
+
+
+class WatchlistMatcher:
+    """
+    Matching engine compiled from all registered watchlist rules.
+    """
+
+    def __init__(self, rules):
+        self._brand_automaton = AhoCorasick()
+        self._keyword_automaton = AhoCorasick()
+        self._price_thresholds = []
+        self._price_rule_ids = []
+        self._rule_chat = {}
+
+        price_rules = []
+        for rule in rules:
+            rule_type = rule["rule_type"]
+            self._rule_chat[rule["id"]] = rule["chat_id"]
+
+            if rule_type == WatchlistRuleType.BRAND.value:
+                self._brand_automaton.add(normalize_text(rule["pattern"]), rule["id"])
+            elif rule_type == WatchlistRuleType.KEYWORD.value:
+                self._keyword_automaton.add(normalize_text(rule["pattern"]), rule["id"])
+            elif rule_type == WatchlistRuleType.PRICE_BELOW.value:
+                try:
+                    price_rules.append((float(rule["pattern"]), rule["id"]))
+                except ValueError:
+                    print(f"Invalid price rule skipped: {rule}")
+
+        # 價格門檻由小到大排序，價格低於門檻的規則即為排序後的尾段
+        price_rules.sort()
+        self._price_thresholds = [threshold for threshold, _ in price_rules]
+        self._price_rule_ids = [rule_id for _, rule_id in price_rules]
+
+        self._brand_automaton.build()
+        self._keyword_automaton.build()
+
+    def match_product(self, product_info):
+        """
+        Return the ids of all rules that match a single product.
+        """
+        matched = set()
+        matched.update(self._brand_automaton.search(normalize_text(product_info.brand)))
+        matched.update(self._keyword_automaton.search(normalize_text(product_info.product_name)))
+
+        price = parse_price(product_info.price)
+        if price is not None:
+            index = bisect_right(self._price_thresholds, price)
+            matched.update(self._price_rule_ids[index:])
+
+        return matched
+
+    def match_products(self, products_info):
+        """
+        Match a batch of products and group the hits by chat.
+
+        Returns {chat_id: [(product_info, [rule_id, ...]), ...]}.
+        """
+        matches_by_chat = {}
+        for product_info in products_info:
+            rule_ids = self.match_product(product_info)
+            if not rule_ids:
+                continue
+
+            rules_by_chat = {}
+            for rule_id in rule_ids:
+                rules_by_chat.setdefault(self._rule_chat[rule_id], []).append(rule_id)
+
+            for chat_id, chat_rule_ids in rules_by_chat.items():
+                matches_by_chat.setdefault(chat_id, []).append((product_info, sorted(chat_rule_ids)))
+
+        return matches_by_chat
+
+
+def normalize_text(text):
+    """
+    Normalize text for case-insensitive keyword matching.
+    """
+    if not text:
+        return ""
+    return str(text).casefold()
+
+
+def parse_price(price):
+    """
+    Convert a scraped or stored price to a float, or None if it is not numeric.
+    """
+    try:
+        return float(str(price).replace(",", ""))
+    except (TypeError, ValueError):
+        return None